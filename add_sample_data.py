@@ -4,8 +4,11 @@ Script to add comprehensive sample data to the database.
 This includes users, posts, comments, and votes for testing.
 """
 
-from app import app
+from app import create_app
 from backend.models import db, User, Post, Vote, Comment
+from backend.search import index_post
+from backend.tags import set_post_tags
+from backend.repair_counters import repair_vote_counts
 from backend.auth import bcrypt
 from datetime import datetime, timedelta
 import random
@@ -212,6 +215,9 @@ def add_sample_posts(users):
             created_at=datetime.utcnow() - timedelta(days=random.randint(1, 30))
         )
         db.session.add(post)
+        db.session.flush()  # need the id for the search index and tags
+        index_post(post)
+        set_post_tags(post, post.tags)
         created_posts.append(post)
         print(f"  Added post: {post_data['title']} (by {author.username})")
 
@@ -268,6 +274,7 @@ def add_sample_comments(users, posts):
                 created_at=post.created_at + timedelta(hours=random.randint(1, 72))
             )
             db.session.add(comment)
+            post.comment_count += 1
             added_count += 1
 
     db.session.commit()
@@ -310,13 +317,13 @@ def add_sample_votes(users, posts):
 
     # Update vote scores for all posts
     print("  Calculating vote scores...")
-    for post in posts:
-        post.update_vote_score()
+    repair_vote_counts()
 
     print(f"  Added {added_count} votes")
 
 
 def main():
+    app = create_app()
     with app.app_context():
         print("=" * 70)
         print("Adding Comprehensive Sample Data to Database")
@@ -4,11 +4,14 @@ Script to add sample internship posts to the database.
 Run this after the database is set up and you have at least one user.
 """
 
-from app import app
+from app import create_app
 from backend.models import db, User, Post, Vote, Comment
+from backend.search import index_post
+from backend.tags import set_post_tags
 from datetime import datetime
 
 def add_sample_internships():
+    app = create_app()
     with app.app_context():
         # Get the admin user to be the author
         admin = User.query.filter_by(username='admin').first()
@@ -112,6 +115,9 @@ def add_sample_internships():
                 vote_score=0
             )
             db.session.add(post)
+            db.session.flush()  # need the id for the search index and tags
+            index_post(post)
+            set_post_tags(post, post.tags)
             added_count += 1
             print(f"  Added: {post_data['title']}")
 
@@ -3,9 +3,12 @@ Database migration script to add indexes for better performance
 Run this once to add indexes to existing database
 """
 
-from app import app, db
+from app import create_app
+from backend.models import db
+from backend.search import rebuild_search_index
 
 def add_indexes():
+    app = create_app()
     with app.app_context():
         # get the database connection
         connection = db.engine.connect()
@@ -23,6 +26,44 @@ def add_indexes():
             print("Adding index on post.author_id...")
             connection.execute(db.text("CREATE INDEX IF NOT EXISTS idx_post_author_id ON post(author_id)"))
 
+            # add index on comment post_id for counting comments per post
+            print("Adding index on comment.post_id...")
+            connection.execute(db.text("CREATE INDEX IF NOT EXISTS idx_comment_post_id ON comment(post_id)"))
+
+            # composite index for paging through a post's comments oldest first
+            print("Adding comment page index on comment...")
+            connection.execute(db.text("CREATE INDEX IF NOT EXISTS ix_comment_post_created ON comment(post_id, created_at, id)"))
+
+            # comment.author_id for the per-user comment counts in the admin user list
+            print("Adding index on comment.author_id...")
+            connection.execute(db.text("CREATE INDEX IF NOT EXISTS ix_comment_author_id ON comment(author_id)"))
+
+            # composite index for the moderation queue (reports by status, newest first)
+            print("Adding moderation queue index on report...")
+            connection.execute(db.text("CREATE INDEX IF NOT EXISTS ix_report_status_created ON report(status, created_at, id)"))
+
+            # add index on post updated_at (last edit to the post)
+            print("Adding index on post.updated_at...")
+            connection.execute(db.text("CREATE INDEX IF NOT EXISTS idx_post_updated_at ON post(updated_at)"))
+
+            # add index on post activity_at for the feed's Last-Modified header
+            print("Adding index on post.activity_at...")
+            connection.execute(db.text("CREATE INDEX IF NOT EXISTS ix_post_activity_at ON post(activity_at)"))
+
+            # add index on post import_batch so bulk imports can find the ids they just made
+            print("Adding index on post.import_batch...")
+            connection.execute(db.text("CREATE INDEX IF NOT EXISTS ix_post_import_batch ON post(import_batch)"))
+
+            # composite indexes for the feed sorts (used by cursor pagination)
+            print("Adding feed sort indexes on post...")
+            connection.execute(db.text("CREATE INDEX IF NOT EXISTS ix_post_feed_recent ON post(status, approved, created_at, id)"))
+            connection.execute(db.text("CREATE INDEX IF NOT EXISTS ix_post_feed_popular ON post(status, approved, vote_score, created_at, id)"))
+            connection.execute(db.text("CREATE INDEX IF NOT EXISTS ix_post_feed_trending ON post(status, approved, hot_score, created_at, id)"))
+
+            # most reported posts first (admin post list, moderation queue)
+            print("Adding pending report index on post...")
+            connection.execute(db.text("CREATE INDEX IF NOT EXISTS ix_post_pending_reports ON post(pending_report_count, created_at, id)"))
+
             connection.commit()
             print("All indexes added successfully!")
 
@@ -32,6 +73,11 @@ def add_indexes():
         finally:
             connection.close()
 
+        # full-text index for search (FULLTEXT on mysql, fts5 table on sqlite)
+        print("Building search index...")
+        rebuild_search_index()
+        print("Search index ready!")
+
 if __name__ == '__main__':
     print("Starting database index migration...")
     add_indexes()
@@ -1,27 +1,49 @@
-from flask import Blueprint, request, jsonify, session
-from sqlalchemy import desc
-from backend.models import db, Post, User, Report
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
+from sqlalchemy import desc, func, or_
+from sqlalchemy.orm import joinedload
+from backend.models import db, Post, User, Report, Comment, Vote
 from backend.auth import admin_required
+from backend.search import index_post, unindex_post
+from backend.cache import response_cache
+from backend.export import EXPORTS, FORMATS, export_stream
+from backend.moderation import POST_ACTIONS, parse_ids, set_posts_status, outcome_list, release_posts
 from datetime import datetime
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
+# biggest page the admin lists will return
+MAX_PER_PAGE = 100
+
 @admin_bp.route('/posts', methods=['GET'])
 @admin_required
 def get_all_posts():
     try:
         # Get query parameters
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), MAX_PER_PAGE))
         status = request.args.get('status', 'all')  # all, active, deleted, expired
+        sort_by = request.args.get('sort', 'recent')  # recent, reports
+        min_reports = request.args.get('min_reports', 0, type=int)
+        
+        if sort_by not in ['recent', 'reports']:
+            return jsonify({'error': 'Invalid sort. Must be "recent" or "reports"'}), 400
         
-        # Build query
-        query = Post.query
+        # pending report counts come from post.pending_report_count (kept up to
+        # date by reports.py), so sorting/filtering on them is an index lookup
+        report_count = Post.pending_report_count
+        
+        # Build query (authors come in the same query)
+        query = Post.query.options(joinedload(Post.author))
         if status != 'all':
-            query = query.filter_by(status=status)
+            query = query.filter(Post.status == status)
+        if min_reports > 0:
+            query = query.filter(report_count >= min_reports)
         
-        # Order by creation date (newest first)
-        query = query.order_by(desc(Post.created_at))
+        # newest first, or most reported first for cleanup sweeps
+        if sort_by == 'reports':
+            query = query.order_by(desc(report_count), desc(Post.created_at), desc(Post.id))
+        else:
+            query = query.order_by(desc(Post.created_at), desc(Post.id))
         
         # Paginate
         posts_paginated = query.paginate(
@@ -33,9 +55,6 @@ def get_all_posts():
         # Format response
         posts_data = []
         for post in posts_paginated.items:
-            # Get report count for this post
-            report_count = Report.query.filter_by(post_id=post.id, status='pending').count()
-            
             posts_data.append({
                 'id': post.id,
                 'title': post.title,
@@ -50,7 +69,7 @@ def get_all_posts():
                 'status': post.status,
                 'approved': post.approved,
                 'vote_score': post.vote_score,
-                'report_count': report_count,
+                'report_count': post.pending_report_count,
                 'created_at': post.created_at.isoformat(),
                 'updated_at': post.updated_at.isoformat()
             })
@@ -82,7 +101,10 @@ def delete_post_admin(post_id):
         # Mark as deleted instead of actually deleting
         post.status = 'deleted'
         post.updated_at = datetime.utcnow()
+        post.touch()
+        unindex_post(post.id)
         db.session.commit()
+        response_cache.invalidate_post(post.id)
         
         return jsonify({
             'message': 'Post marked as deleted',
@@ -109,14 +131,20 @@ def restore_post_admin(post_id):
         # Restore post to active status
         post.status = 'active'
         post.updated_at = datetime.utcnow()
+        post.touch()
+        index_post(post)
+        # a restored post isn't quarantined any more (unless it's still over the threshold)
+        release_posts([post.id])
         db.session.commit()
+        response_cache.invalidate_post(post.id)
         
         return jsonify({
             'message': 'Post restored successfully',
             'post': {
                 'id': post.id,
                 'title': post.title,
-                'status': post.status
+                'status': post.status,
+                'approved': post.approved
             }
         }), 200
         
@@ -124,16 +152,109 @@ def restore_post_admin(post_id):
         db.session.rollback()
         return jsonify({'error': 'Failed to restore post'}), 500
 
+@admin_bp.route('/posts/bulk', methods=['POST'])
+@admin_required
+def bulk_post_action():
+    """Delete, expire or restore many posts in one transaction.
+
+    POST {"post_ids": [...], "action": "delete" | "expire" | "restore"}
+    Every id comes back with an outcome: updated, unchanged or not_found.
+    """
+    try:
+        data = request.get_json() or {}
+        action = data.get('action')
+        if action not in POST_ACTIONS:
+            return jsonify({'error': f'Invalid action. Must be one of: {", ".join(POST_ACTIONS)}'}), 400
+        
+        try:
+            post_ids = parse_ids(data.get('post_ids'), 'post_ids')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        outcomes = set_posts_status(post_ids, POST_ACTIONS[action])
+        db.session.commit()
+        
+        updated = [post_id for post_id, outcome in outcomes.items() if outcome == 'updated']
+        if updated:
+            response_cache.invalidate_posts(updated)
+        
+        return jsonify({
+            'message': f'{len(updated)} posts updated',
+            'action': action,
+            'updated': len(updated),
+            'posts': outcome_list(outcomes)
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to update posts'}), 500
+
+def grouped_count(user_column, *filters):
+    # (user_id, n) for every user with at least one row
+    return db.session.query(
+        user_column.label('user_id'), func.count().label('n')
+    ).filter(*filters).group_by(user_column)
+
+def user_stat_subqueries():
+    """name -> (user_id, n) subquery for each per-user stat in the user list.
+
+    Each one is a GROUP BY over an index that starts with the user column, so
+    it's an index scan, not a table scan.
+    """
+    return {
+        'posts': grouped_count(Post.author_id).subquery('posts'),
+        'comments': grouped_count(Comment.author_id).subquery('comments'),
+        'votes': grouped_count(Vote.user_id).subquery('votes'),
+        'reports_made': grouped_count(Report.reporter_id).subquery('reports_made'),
+        # pending reports against the user's posts - what spam accounts pile up
+        'reports_received': grouped_count(Post.author_id).join(
+            Report, Report.post_id == Post.id
+        ).filter(Report.status == 'pending').subquery('reports_received'),
+    }
+
+USER_SORTS = ['created_at', 'username', 'posts', 'comments', 'votes', 'reports_made', 'reports_received']
+
 @admin_bp.route('/users', methods=['GET'])
 @admin_required
 def get_all_users():
     try:
         # Get query parameters
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), MAX_PER_PAGE))
+        search = request.args.get('q', '').strip()  # prefix of username or email
+        role = request.args.get('role')
+        sort_by = request.args.get('sort', 'created_at')
+        
+        if sort_by not in USER_SORTS:
+            return jsonify({'error': f'Invalid sort. Must be one of: {", ".join(USER_SORTS)}'}), 400
         
-        # Get all users
-        users_paginated = User.query.order_by(desc(User.created_at)).paginate(
+        # one grouped subquery per stat, all outer joined onto user so the
+        # page (sorted by any stat) comes back in a single query
+        subqueries = user_stat_subqueries()
+        # coalesce so users with no rows show (and sort as) 0 instead of null
+        stats = {name: func.coalesce(subquery.c.n, 0) for name, subquery in subqueries.items()}
+        query = User.query.add_columns(*stats.values())
+        for subquery in subqueries.values():
+            query = query.outerjoin(subquery, subquery.c.user_id == User.id)
+        
+        if search:
+            # prefix LIKE can use the unique indexes on username/email
+            pattern = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            query = query.filter(or_(
+                User.username.like(pattern, escape='\\'),
+                User.email.like(pattern.lower(), escape='\\')
+            ))
+        if role:
+            query = query.filter(User.role == role)
+        
+        if sort_by == 'created_at':
+            query = query.order_by(desc(User.created_at), desc(User.id))
+        elif sort_by == 'username':
+            query = query.order_by(User.username)
+        else:
+            query = query.order_by(desc(stats[sort_by]), desc(User.id))
+        
+        users_paginated = query.paginate(
             page=page, 
             per_page=per_page, 
             error_out=False
@@ -141,15 +262,18 @@ def get_all_users():
         
         # Format response
         users_data = []
-        for user in users_paginated.items:
-            post_count = Post.query.filter_by(author_id=user.id).count()
-            
+        for user, *counts in users_paginated.items:
+            user_stats = dict(zip(stats, counts))
             users_data.append({
                 'id': user.id,
                 'username': user.username,
                 'email': user.email,
                 'role': user.role,
-                'post_count': post_count,
+                'post_count': user_stats['posts'],
+                'comment_count': user_stats['comments'],
+                'vote_count': user_stats['votes'],
+                'reports_made': user_stats['reports_made'],
+                'reports_received': user_stats['reports_received'],
                 'created_at': user.created_at.isoformat()
             })
         
@@ -166,4 +290,30 @@ def get_all_users():
         }), 200
         
     except Exception as e:
-        return jsonify({'error': 'Failed to fetch users'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to fetch users'}), 500
+
+@admin_bp.route('/cache', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    # hit/miss numbers for sizing the response cache
+    return jsonify({'cache': response_cache.stats()}), 200
+
+@admin_bp.route('/export/<table>', methods=['GET'])
+@admin_required
+def export_table(table):
+    # streams the whole table (posts, votes or reports) as ndjson or csv
+    if table not in EXPORTS:
+        return jsonify({'error': 'Unknown export'}), 404
+    
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in FORMATS:
+        return jsonify({'error': 'Format must be ndjson or csv'}), 400
+    gzip = request.args.get('gzip', 'false').lower() in ('1', 'true', 'yes')
+    
+    filename = f'{table}.{export_format}' + ('.gz' if gzip else '')
+    # stream_with_context keeps the db session around while the generator runs
+    return Response(
+        stream_with_context(export_stream(table, export_format, gzip)),
+        mimetype='application/gzip' if gzip else FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
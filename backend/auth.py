@@ -1,14 +1,43 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, g
 from flask_bcrypt import Bcrypt
 from backend.models import db, User
+from backend.passwords import password_hasher, PasswordHasherBusy
+from backend.ratelimit import rate_limit
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 bcrypt = Bcrypt()
 
 def init_bcrypt(app):
     bcrypt.init_app(app)
+    password_hasher.init_app(app)
+
+def busy_response():
+    # the password hashing pool is full - better to say so than pile up more work
+    response = jsonify({'error': 'Server is busy, please try again in a moment'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def load_current_user():
+    """The logged in User for this request, or None.
+
+    Loaded from the session the first time something asks and kept on flask.g
+    for the rest of the request, so decorators and handlers share one lookup.
+    """
+    user_id = session.get('user_id')
+    # keyed by id so a login/logout partway through (or a reused app context) can't
+    # hand back the wrong user
+    cached = g.get('current_user')
+    if cached is None or cached[0] != user_id:
+        g.current_user = (user_id, db.session.get(User, user_id) if user_id else None)
+    return g.current_user[1]
+
+def can_modify(author_id):
+    """True if the current user wrote the thing (post, comment...) or is an admin."""
+    user = load_current_user()
+    return user is not None and (user.id == author_id or user.is_admin())
 
 @auth_bp.route('/signup', methods=['POST'])
+@rate_limit('signup', by='ip')
 def signup():
     data = request.get_json()
     
@@ -52,7 +81,10 @@ def signup():
         return jsonify({'error': 'Email already registered'}), 400
     
     # make new user
-    password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+    try:
+        password_hash = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return busy_response()
     new_user = User(
         username=username,
         email=email,
@@ -79,6 +111,7 @@ def signup():
     }), 201
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', by='ip')
 def login():
     data = request.get_json()
     
@@ -97,8 +130,16 @@ def login():
     ).first()
     
     # check if user exists and password is correct
-    if not user or not bcrypt.check_password_hash(user.password_hash, password):
-        return jsonify({'error': 'Invalid username or password'}), 401
+    try:
+        if not user or not password_hasher.check(user.password_hash, password):
+            return jsonify({'error': 'Invalid username or password'}), 401
+        
+        # hashed at an older cost - upgrade it now that we have the password
+        if password_hasher.needs_rehash(user.password_hash):
+            user.password_hash = password_hasher.hash(password)
+            db.session.commit()
+    except PasswordHasherBusy:
+        return busy_response()
     
     # store user info in session
     session['user_id'] = user.id
@@ -125,7 +166,7 @@ def get_current_user():
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    user = User.query.get(session['user_id'])
+    user = load_current_user()
     if not user:
         session.clear()
         return jsonify({'error': 'User not found'}), 401
@@ -143,7 +184,8 @@ def get_current_user():
 # decorator to check if user is logged in
 def login_required(f):
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        # also turns away sessions for users that have since been deleted
+        if load_current_user() is None:
             return jsonify({'error': 'Authentication required'}), 401
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
@@ -152,11 +194,12 @@ def login_required(f):
 # decorator to check if user is admin
 def admin_required(f):
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
+        user = load_current_user()
+        if user is None:
             return jsonify({'error': 'Authentication required'}), 401
         
-        user = User.query.get(session['user_id'])
-        if not user or not user.is_admin():
+        # role check on the already loaded user, handlers reuse it too
+        if not user.is_admin():
             return jsonify({'error': 'Admin access required'}), 403
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
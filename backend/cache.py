@@ -0,0 +1,168 @@
+"""Response cache for the public read endpoints (feed and post detail).
+
+Cached bodies never contain per-user fields (user_vote, can_edit) - those get
+put back on top for each request. Entries are keyed by a version number per
+namespace ("feed", "post:<id>") and writes just bump the version, so stale
+entries are never read again and age out of the LRU on their own.
+
+The default backend is an in-process LRU with a TTL. With several workers each
+one has its own copy and only sees its own invalidations, so the TTL is the
+staleness bound there - use a shared CacheBackend to avoid that.
+"""
+from collections import OrderedDict
+from threading import Lock
+import time
+
+
+class CacheBackend:
+    """Storage interface for ResponseCache. Implement this for a shared store."""
+
+    def get(self, key):
+        """Return the value for key, or None if missing/expired."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def get_version(self, namespace):
+        """Current version number of a namespace (0 if never bumped)."""
+        raise NotImplementedError
+
+    def bump_version(self, namespace):
+        """Atomically increment a namespace's version."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        return 0
+
+
+class LRUBackend(CacheBackend):
+    """Bounded in-process LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+        # versions are kept apart from the entries so the LRU can never evict
+        # one - losing a version would make old entries readable again
+        self.versions = {}
+        self.evictions = 0
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_version(self, namespace):
+        return self.versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        with self.lock:
+            self.versions[namespace] = self.versions.get(namespace, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.versions.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ResponseCache:
+    """Versioned cache for read responses, set up per app with init_app."""
+
+    def __init__(self):
+        self.backend = None
+        self.enabled = False
+        self.ttl = 30
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CACHE_ENABLED', True)
+        self.ttl = app.config.get('CACHE_TTL', 30)
+        self.backend = app.config.get('CACHE_BACKEND') or LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, namespace, *parts):
+        version = self.backend.get_version(namespace)
+        return ':'.join([namespace, f'v{version}'] + [str(part) for part in parts])
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        value = self.backend.get(key)
+        # not locked - these are only for sizing so being off by a few is fine
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.enabled:
+            self.backend.set(key, value, self.ttl)
+
+    def feed_key(self, **args):
+        # args come in already normalized, sort them so the key doesn't depend on order
+        return self.key('feed', *[f'{name}={args[name]}' for name in sorted(args)])
+
+    def post_key(self, post_id):
+        return self.key(f'post:{post_id}')
+
+    def invalidate_feed(self):
+        """Call after committing anything that changes what the feed shows."""
+        if self.backend is not None:
+            self.backend.bump_version('feed')
+
+    def invalidate_post(self, post_id):
+        """Call after committing a change to a post, its votes or its comments."""
+        if self.backend is not None:
+            self.backend.bump_version(f'post:{post_id}')
+            self.backend.bump_version('feed')
+
+    def invalidate_posts(self, post_ids):
+        """invalidate_post for a batch of posts, bumping the feed once."""
+        if self.backend is not None:
+            for post_id in post_ids:
+                self.backend.bump_version(f'post:{post_id}')
+            self.backend.bump_version('feed')
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'entries': len(self.backend) if self.backend is not None else 0,
+            'max_entries': getattr(self.backend, 'max_entries', None),
+            'evictions': getattr(self.backend, 'evictions', None),
+            'ttl': self.ttl
+        }
+
+
+response_cache = ResponseCache()
+
+def init_cache(app):
+    response_cache.init_app(app)
@@ -1,12 +1,95 @@
-from flask import Blueprint, request, jsonify, session
-from backend.models import db, Post, Comment, User
-from backend.auth import login_required
+from flask import Blueprint, request, jsonify, session, current_app
+from sqlalchemy import func, or_, and_
+from sqlalchemy.orm import joinedload
+from backend.models import db, Post, Comment
+from backend.auth import login_required, load_current_user, can_modify
+from backend.ratelimit import rate_limit
+from backend.cache import response_cache
+from backend.conditional import make_etag, not_modified, not_modified_response, with_validators
 from datetime import datetime
+import base64
+import binascii
+import json
 
 comments_bp = Blueprint('comments', __name__, url_prefix='/api/comments')
 
+# default comments per page (app.config COMMENTS_PER_PAGE overrides it). the post
+# detail endpoint embeds the first page
+COMMENTS_PER_PAGE = 50
+MAX_COMMENTS_PER_PAGE = 200
+
+def get_comment_counts(post_ids):
+    """Return {post_id: comment_count} for a batch of posts with one grouped query.
+
+    Posts without comments are left out, so callers should use .get(post_id, 0).
+    """
+    if not post_ids:
+        return {}
+    
+    rows = db.session.query(Comment.post_id, func.count(Comment.id)).filter(
+        Comment.post_id.in_(post_ids)
+    ).group_by(Comment.post_id).all()
+    return {post_id: count for post_id, count in rows}
+
+def encode_comment_cursor(comment):
+    """Opaque cursor pointing just after `comment` (oldest first, by created_at then id)."""
+    raw = json.dumps({'after': [comment.created_at.isoformat(), comment.id]}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_comment_cursor(cursor):
+    """Turn a comment cursor back into (created_at, id). Raises ValueError if it's bad."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        created_at, comment_id = data['after']
+        if not isinstance(comment_id, int):
+            raise ValueError('Invalid cursor')
+        return datetime.fromisoformat(created_at), comment_id
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def comments_per_page():
+    return current_app.config.get('COMMENTS_PER_PAGE', COMMENTS_PER_PAGE)
+
+def query_comment_page(post_id, per_page=None, cursor=None):
+    """One page of a post's comments, oldest first, with their authors.
+
+    Returns (comments, pagination). Seeks on the (post_id, created_at, id)
+    index, so a page costs the same on a post with thousands of comments.
+    """
+    per_page = per_page or comments_per_page()
+    query = Comment.query.options(joinedload(Comment.author)).filter(Comment.post_id == post_id)
+    if cursor:
+        created_at, comment_id = decode_comment_cursor(cursor)
+        query = query.filter(or_(
+            Comment.created_at > created_at,
+            and_(Comment.created_at == created_at, Comment.id > comment_id)
+        ))
+    
+    # one extra row tells us if there's another page
+    comments = query.order_by(Comment.created_at.asc(), Comment.id.asc()).limit(per_page + 1).all()
+    has_next = len(comments) > per_page
+    comments = comments[:per_page]
+    return comments, {
+        'per_page': per_page,
+        'has_next': has_next,
+        'next_cursor': encode_comment_cursor(comments[-1]) if has_next else None
+    }
+
+def format_comments(comments):
+    """Format comments without the per-user can_edit field (so they can be cached)."""
+    return [{
+        'id': comment.id,
+        'content': comment.content,
+        'author': {
+            'id': comment.author.id,
+            'username': comment.author.username
+        },
+        'created_at': comment.created_at.isoformat()
+    } for comment in comments]
+
 @comments_bp.route('', methods=['POST'])
 @login_required
+@rate_limit('create_comment')
 def create_comment():
     data = request.get_json()
     print(f"Creating comment: {data}")  # debug
@@ -37,11 +120,15 @@ def create_comment():
     )
     
     db.session.add(new_comment)
+    # counted in sql so concurrent comments can't overwrite each other's count
+    post.comment_count = Post.comment_count + 1
+    post.touch()
     db.session.commit()
+    response_cache.invalidate_post(post_id)
     print(f"Comment created with id: {new_comment.id}")  # debug
         
     # get author info to return with comment
-    author = User.query.get(session['user_id'])
+    author = load_current_user()
     return jsonify({
         'message': 'Comment created successfully',
         'comment': {
@@ -65,30 +152,32 @@ def get_post_comments(post_id):
         if not post:
             return jsonify({'error': 'Post not found'}), 404
         
-        # Get comments for this post
-        comments = Comment.query.filter_by(post_id=post_id).order_by(Comment.created_at.asc()).all()
+        per_page = request.args.get('per_page', comments_per_page(), type=int)
+        per_page = max(1, min(per_page, MAX_COMMENTS_PER_PAGE))
+        cursor = request.args.get('cursor') or None
         
-        comments_data = []
-        for comment in comments:
-            comments_data.append({
-                'id': comment.id,
-                'content': comment.content,
-                'author': {
-                    'id': comment.author.id,
-                    'username': comment.author.username
-                },
-                'created_at': comment.created_at.isoformat(),
-                'can_edit': 'user_id' in session and (
-                    session['user_id'] == comment.author_id or 
-                    User.query.get(session['user_id']).is_admin()
-                )
-            })
+        # comment changes bump the post revision, so we can answer 304 from the post row
+        etag = make_etag('comments', post.id, post.revision, per_page, cursor)
+        if not_modified(etag, post.activity_at):
+            return not_modified_response(etag, post.activity_at)
         
-        return jsonify({
+        # Get one page of comments for this post
+        try:
+            comments, pagination = query_comment_page(post_id, per_page, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        comments_data = [
+            dict(comment, can_edit=can_modify(comment['author']['id']))
+            for comment in format_comments(comments)
+        ]
+        
+        return with_validators(jsonify({
             'post_id': post_id,
             'comments': comments_data,
-            'comment_count': len(comments_data)
-        }), 200
+            'comment_count': post.comment_count,
+            'pagination': pagination
+        }), etag, post.activity_at), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch comments'}), 500
@@ -103,8 +192,7 @@ def update_comment(comment_id):
             return jsonify({'error': 'Comment not found'}), 404
         
         # Check permission
-        user = User.query.get(session['user_id'])
-        if comment.author_id != session['user_id'] and not user.is_admin():
+        if not can_modify(comment.author_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         data = request.get_json()
@@ -120,7 +208,9 @@ def update_comment(comment_id):
             return jsonify({'error': 'Comment cannot exceed 1000 characters'}), 400
         
         comment.content = content
+        comment.post.touch()
         db.session.commit()
+        response_cache.invalidate_post(comment.post_id)
         
         return jsonify({
             'message': 'Comment updated successfully',
@@ -149,12 +239,15 @@ def delete_comment(comment_id):
             return jsonify({'error': 'Comment not found'}), 404
         
         # Check permission
-        user = User.query.get(session['user_id'])
-        if comment.author_id != session['user_id'] and not user.is_admin():
+        if not can_modify(comment.author_id):
             return jsonify({'error': 'Permission denied'}), 403
         
+        post_id = comment.post_id
+        comment.post.comment_count = Post.comment_count - 1
+        comment.post.touch()
         db.session.delete(comment)
         db.session.commit()
+        response_cache.invalidate_post(post_id)
         
         return jsonify({'message': 'Comment deleted successfully'}), 200
         
@@ -0,0 +1,59 @@
+"""Conditional GET (ETag / Last-Modified) helpers for the read endpoints.
+
+Every change to a post, its votes or its comments bumps post.revision (see
+Post.touch), so an ETag built from the revisions a response covers is a strong
+validator. The post row's activity_at also moves on every one of those writes
+(onupdate) and is used for Last-Modified. updated_at is only the last edit to
+the post itself, so it's not a validator.
+
+Handlers work out the validators from the rows they already have, check them
+with not_modified() and return 304 before loading or formatting anything else.
+"""
+from datetime import timezone
+import hashlib
+import json
+from flask import request, session, current_app
+
+
+def make_etag(*parts):
+    """Hash the things a response depends on (plus who is asking) into an ETag."""
+    # per-user fields (user_vote, can_edit) are in the body, so the user is too
+    viewer = (session.get('user_id'), session.get('role'))
+    raw = json.dumps([viewer, list(parts)], default=str, separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def not_modified(etag, last_modified=None):
+    """True if the client's cached copy is still good.
+
+    If-None-Match wins when both headers are sent, like the HTTP spec says.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+
+    if request.if_modified_since and last_modified:
+        # our datetimes are naive UTC and http dates only have whole seconds
+        last_modified = last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        return last_modified <= request.if_modified_since
+
+    return False
+
+
+def with_validators(response, etag, last_modified=None):
+    """Put ETag/Last-Modified on a response. Takes (response, status) tuples too."""
+    status = None
+    if isinstance(response, tuple):
+        response, status = response
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # the session cookie changes the body, so shared caches can't mix users up
+    response.vary.add('Cookie')
+    if status is not None:
+        response.status_code = status
+    return response
+
+
+def not_modified_response(etag, last_modified=None):
+    """Empty 304 that still carries the validators."""
+    return with_validators(current_app.response_class(status=304), etag, last_modified)
@@ -0,0 +1,123 @@
+"""
+Streaming exports of posts, votes and reports for analytics dumps
+Rows are read with a server-side cursor (yield_per) and written out a chunk at
+a time, so memory stays flat no matter how big the table is. Used by the
+/api/admin/export/<table> endpoint and from the command line:
+
+    python3 backend/export.py posts --format csv --gzip -o posts.csv.gz
+"""
+import csv
+import io
+import json
+import os
+import sys
+import zlib
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models import db, Post, Vote, Report
+
+# columns that go into each export, in order
+EXPORTS = {
+    'posts': [
+        Post.id, Post.title, Post.description, Post.company, Post.link, Post.tags,
+        Post.author_id, Post.status, Post.approved, Post.vote_score, Post.upvotes, Post.downvotes,
+        Post.comment_count, Post.created_at, Post.updated_at
+    ],
+    'votes': [Vote.id, Vote.user_id, Vote.post_id, Vote.vote_type, Vote.created_at],
+    'reports': [
+        Report.id, Report.reporter_id, Report.post_id, Report.reason, Report.status,
+        Report.reviewed_by, Report.reviewed_at, Report.created_at
+    ],
+}
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+BATCH_SIZE = 1000
+
+
+def export_rows(table, batch_size=BATCH_SIZE):
+    """Yield every row of an export as a dict, streamed from the database in id order."""
+    columns = EXPORTS[table]
+    query = db.select(*columns).order_by(columns[0]).execution_options(yield_per=batch_size)
+    names = [column.key for column in columns]
+    for row in db.session.execute(query):
+        yield dict(zip(names, row))
+
+
+def to_ndjson(rows, batch_size=BATCH_SIZE):
+    # one json object per line, joined up into chunks so we don't yield per row
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(row, default=format_value))
+        if len(chunk) >= batch_size:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def to_csv(rows, columns, batch_size=BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([format_value(row[name]) for name in columns])
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def gzip_stream(chunks):
+    """Gzip a stream of text chunks on the fly."""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(table, format='ndjson', gzip=False, batch_size=BATCH_SIZE):
+    """Chunks (str, or bytes when gzipped) for a whole export."""
+    rows = export_rows(table, batch_size)
+    if format == 'csv':
+        chunks = to_csv(rows, [column.key for column in EXPORTS[table]], batch_size)
+    else:
+        chunks = to_ndjson(rows, batch_size)
+    return gzip_stream(chunks) if gzip else chunks
+
+
+if __name__ == '__main__':
+    import argparse
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Export a table as NDJSON or CSV')
+    parser.add_argument('table', choices=sorted(EXPORTS))
+    parser.add_argument('--format', choices=sorted(FORMATS), default='ndjson')
+    parser.add_argument('--gzip', action='store_true', help='gzip the output')
+    parser.add_argument('-o', '--output', help='file to write (default: stdout)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.output:
+            out = open(args.output, 'wb') if args.gzip else open(args.output, 'w', newline='')
+        else:
+            out = sys.stdout.buffer if args.gzip else sys.stdout
+        try:
+            for chunk in export_stream(args.table, args.format, args.gzip):
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
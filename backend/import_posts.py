@@ -0,0 +1,49 @@
+"""
+Imports internship posts in bulk from a JSON or CSV file
+Same validation as creating a post through the app, but rows go in with
+one batched INSERT a chunk at a time instead of one commit per post
+
+    python3 backend/import_posts.py postings.csv --author admin
+
+CSV files need a header row with title, description, link and optionally
+company and tags. JSON files are a list of objects with the same keys.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from backend.models import User
+from backend.posts import ingest_posts, read_bulk_rows
+
+def import_posts(path, username):
+    app = create_app()
+    with app.app_context():
+        author = User.query.filter_by(username=username).first()
+        if not author:
+            print(f"Error: user '{username}' not found")
+            return
+
+        with open(path, encoding='utf-8', newline='') as f:
+            rows = read_bulk_rows(f.read(), 'text/csv' if path.lower().endswith('.csv') else 'application/json')
+
+        print(f"Importing {len(rows)} posts as {author.username}...")
+        start = time.perf_counter()
+        result = ingest_posts(rows, author.id)
+        elapsed = time.perf_counter() - start
+
+        for error in result['errors']:
+            print(f"  row {error['row']}: {error['error']}")
+        print(f"Imported {len(result['created'])} posts ({len(result['errors'])} failed) "
+              f"in {elapsed:.2f}s ({len(result['created']) / max(elapsed, 1e-9):.0f} posts/s)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk import internship posts')
+    parser.add_argument('path', help='.csv or .json file')
+    parser.add_argument('--author', default='admin', help='username the posts are created as')
+    args = parser.parse_args()
+    import_posts(args.path, args.author)
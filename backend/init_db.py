@@ -12,6 +12,7 @@ except Exception as exc:
 app = create_app()
 
 from backend.models import db, User, Post, Comment, Vote, Report
+from backend.repair_counters import repair_comment_counts, repair_vote_counts, repair_report_counts
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 
@@ -150,8 +151,13 @@ def create_sample_data():
     
     # Calculate and update vote scores for all posts
     print("Calculating vote scores...")
-    for post in Post.query.all():
-        post.update_vote_score()
+    repair_vote_counts()
+    
+    print("Calculating comment counts...")
+    repair_comment_counts()
+    
+    print("Calculating report counts...")
+    repair_report_counts()
     
     print("\n" + "="*50)
     print("DATABASE SETUP COMPLETE!")
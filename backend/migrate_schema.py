@@ -0,0 +1,62 @@
+"""
+Database migration script to add new tables and columns to an existing database
+db.create_all() only makes missing tables, so columns added to models.py later
+(like post.revision) need an ALTER TABLE - this adds any that are missing
+Safe to run more than once
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import inspect
+from app import create_app
+from backend.models import db
+
+# starting values for new columns that can be worked out from existing ones
+BACKFILLS = {
+    # until now updated_at moved on every write, so it's the best guess at last activity
+    'post.activity_at': "UPDATE post SET activity_at = updated_at",
+}
+
+def add_missing_columns():
+    app = create_app()
+    with app.app_context():
+        print("Creating any missing tables...")
+        db.create_all()
+
+        inspector = inspect(db.engine)
+        with db.engine.begin() as connection:
+            for table in db.metadata.sorted_tables:
+                existing = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+
+                    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=db.engine.dialect)}"
+                    # new NOT NULL columns need a default for the rows already there
+                    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                    if default is not None:
+                        ddl += f" NOT NULL DEFAULT {int(default) if isinstance(default, bool) else default}"
+                    elif not column.nullable and isinstance(column.type, (db.Integer, db.Float)):
+                        # computed numbers (like post.hot_score) start at 0 until their backfill runs
+                        ddl += " NOT NULL DEFAULT 0"
+                        print(f"  {table.name}.{column.name} starts at 0, run its backfill script (see SCRIPTS.md)")
+                    elif not column.nullable:
+                        print(f"  Skipping {table.name}.{column.name} - NOT NULL without a default, add it by hand")
+                        continue
+
+                    print(f"Adding column {table.name}.{column.name}...")
+                    connection.execute(db.text(ddl))
+                    backfill = BACKFILLS.get(f'{table.name}.{column.name}')
+                    if backfill:
+                        print(f"  filling in {table.name}.{column.name}...")
+                        connection.execute(db.text(backfill))
+
+        print("Schema is up to date!")
+
+if __name__ == '__main__':
+    print("Starting schema migration...")
+    add_missing_columns()
+    print("Migration complete!")
@@ -0,0 +1,47 @@
+"""
+Database migration script to move post tags into the tag/post_tag tables
+Run this once on databases created before tags were normalized - it's safe to
+run again, every post's tag rows just get rebuilt from post.tags
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from backend.models import db, Post
+from backend.tags import set_post_tags
+
+BATCH_SIZE = 500
+
+def migrate_tags():
+    app = create_app()
+    with app.app_context():
+        # makes the new tables, leaves existing ones alone
+        print("Creating tag tables...")
+        db.create_all()
+
+        print("Backfilling post tags...")
+        last_id = 0
+        migrated = 0
+        while True:
+            # go through posts in id order a batch at a time
+            posts = Post.query.filter(Post.id > last_id).order_by(Post.id).limit(BATCH_SIZE).all()
+            if not posts:
+                break
+
+            for post in posts:
+                set_post_tags(post, post.tags)
+            db.session.commit()
+
+            migrated += len(posts)
+            last_id = posts[-1].id
+            print(f"  {migrated} posts done")
+
+        print(f"Tags backfilled for {migrated} posts!")
+
+if __name__ == '__main__':
+    print("Starting tag migration...")
+    migrate_tags()
+    print("Migration complete!")
@@ -1,10 +1,30 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.orm.attributes import set_committed_value
 from datetime import datetime
+import math
 
 # database setup
 db = SQLAlchemy()
 
+# trending score settings (reddit style "hot" ranking). every 10x more votes is
+# worth TRENDING_WINDOW seconds of being newer, so new posts climb past old ones
+# without anyone having to rewrite the old rows
+TRENDING_EPOCH = datetime(2025, 1, 1)
+TRENDING_WINDOW = 45000  # 12.5 hours
+
+def hot_score(vote_score, created_at):
+    vote_score = vote_score or 0
+    order = math.log10(max(abs(vote_score), 1))
+    sign = 1 if vote_score > 0 else -1 if vote_score < 0 else 0
+    age = (created_at - TRENDING_EPOCH).total_seconds()
+    return round(sign * order + age / TRENDING_WINDOW, 7)
+
+def default_hot_score(context):
+    # new posts get their score on insert, whichever way they're created
+    params = context.get_current_parameters()
+    return hot_score(params.get('vote_score'), params.get('created_at') or datetime.utcnow())
+
 # user model
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -32,10 +52,26 @@ class User(UserMixin, db.Model):
         return self.role in ['moderator', 'admin']
     
     def check_password(self, password):
-        # check if password matches
-        from flask_bcrypt import Bcrypt
-        bcrypt = Bcrypt()
-        return bcrypt.check_password_hash(self.password_hash, password)
+        # check if password matches (on the shared hashing pool, see passwords.py)
+        from backend.passwords import password_hasher
+        return password_hasher.check(self.password_hash, password)
+
+
+# tags are normalized into their own table so filtering by tag can use an index.
+# post.tags still keeps the string the author typed for display
+post_tag = db.Table(
+    'post_tag',
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_post_tag_tag_id_post_id', 'tag_id', 'post_id'),
+)
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)  # lowercased and trimmed
+
+    def __repr__(self):
+        return f'<Tag {self.name}>'
 
 
 # posts model - for internship posts
@@ -44,30 +80,89 @@ class Post(db.Model):
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     link = db.Column(db.String(500), nullable=False)
-    tags = db.Column(db.String(500))  # store as comma separated string
+    tags = db.Column(db.String(500))  # comma separated, as typed - filtering uses post_tag
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     status = db.Column(db.String(20), nullable=False, default='active', index=True)  # active, deleted, expired
     approved = db.Column(db.Boolean, nullable=False, default=True)
     company = db.Column(db.String(200))
-    vote_score = db.Column(db.Integer, default=0, index=True)  # calculated from votes
+    vote_score = db.Column(db.Integer, default=0, index=True)  # upvotes - downvotes
+    # vote counters, moved by apply_vote() in the same transaction as the vote row
+    upvotes = db.Column(db.Integer, nullable=False, default=0)
+    downvotes = db.Column(db.Integer, nullable=False, default=0)
+    comment_count = db.Column(db.Integer, nullable=False, default=0)  # kept up to date by comments.py
+    # pending reports on the post, kept up to date by reports.py (see moderation.change_pending_reports)
+    pending_report_count = db.Column(db.Integer, nullable=False, default=0)
+    # goes up on every change to the post, its votes or its comments (used for ETags)
+    revision = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # last edit to the post itself (content/status), set by the code that makes the edit
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # last write of any kind to the row - edits, votes, comments (used for Last-Modified)
+    activity_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    hot_score = db.Column(db.Double, nullable=False, default=default_hot_score)  # for sort=trending, see hot_score()
+    # which bulk import chunk made the post, so ingest_posts can find the new ids (see insert_posts)
+    import_batch = db.Column(db.String(32), index=True)
 
     # relationships
     comments = db.relationship('Comment', backref='post', lazy=True)
     votes = db.relationship('Vote', backref='post', lazy=True)
     reports = db.relationship('Report', backref='post', lazy=True)
 
+    # indexes matching the feed sorts so cursor pages are a single index seek
+    __table_args__ = (
+        db.Index('ix_post_feed_recent', 'status', 'approved', 'created_at', 'id'),
+        db.Index('ix_post_feed_popular', 'status', 'approved', 'vote_score', 'created_at', 'id'),
+        db.Index('ix_post_feed_trending', 'status', 'approved', 'hot_score', 'created_at', 'id'),
+        # most reported first for the admin post list and the moderation queue
+        db.Index('ix_post_pending_reports', 'pending_report_count', 'created_at', 'id'),
+    )
+
     def __repr__(self):
         return f'<Post {self.title}>'
         
-    def update_vote_score(self):
-        # count up votes minus down votes
-        upvotes = Vote.query.filter_by(post_id=self.id, vote_type='up').count()
-        downvotes = Vote.query.filter_by(post_id=self.id, vote_type='down').count()
-        self.vote_score = upvotes - downvotes
-        db.session.commit()
-        print(f"Updated vote score for post {self.id}: {self.vote_score}")  # debug
+    def touch(self):
+        # bump the revision in sql so two requests at once can't both write the same number.
+        # updating the row also moves activity_at (onupdate) which is our Last-Modified
+        self.revision = Post.revision + 1
+
+    def apply_vote(self, old_vote, new_vote):
+        """Move the vote counters for one user's vote going from old_vote to new_vote.
+
+        Either can be 'up', 'down' or None (no vote). The counters are changed
+        with a relative UPDATE in sql so concurrent votes can't overwrite each
+        other, and nothing is committed - the caller commits it together with
+        the vote row itself.
+        """
+        up = (new_vote == 'up') - (old_vote == 'up')
+        down = (new_vote == 'down') - (old_vote == 'down')
+        update = db.update(Post).where(Post.id == self.id).values(
+            upvotes=Post.upvotes + up,
+            downvotes=Post.downvotes + down,
+            vote_score=Post.vote_score + (up - down),
+            revision=Post.revision + 1
+        ).execution_options(synchronize_session=False)
+        counters = (Post.upvotes, Post.downvotes, Post.vote_score, Post.created_at)
+
+        # the UPDATE holds the row lock until commit, so what we read back is our
+        # own result and the hot score can't be worked out from someone else's count.
+        # only the counters come back, not the whole row (description is a TEXT)
+        if db.session.get_bind().dialect.update_returning:
+            upvotes, downvotes, vote_score, created_at = db.session.execute(update.returning(*counters)).one()
+        else:
+            # MySQL has no UPDATE ... RETURNING
+            db.session.execute(update)
+            upvotes, downvotes, vote_score, created_at = db.session.query(*counters).filter(Post.id == self.id).one()
+
+        score = hot_score(vote_score, created_at)
+        db.session.execute(
+            db.update(Post).where(Post.id == self.id).values(hot_score=score).execution_options(synchronize_session=False)
+        )
+
+        # keep this object in step without marking it dirty (that would be another UPDATE at flush)
+        for name, value in (('upvotes', upvotes), ('downvotes', downvotes), ('vote_score', vote_score), ('hot_score', score)):
+            set_committed_value(self, name, value)
+        # moved in sql, loaded again only if something reads them
+        db.session.expire(self, ['revision', 'activity_at'])
 
 
 # comments on posts
@@ -78,6 +173,13 @@ class Comment(db.Model):
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # comment pages are read in this order, and it covers lookups by post_id on its own too
+    # author_id is for the per-user comment counts in the admin user list
+    __table_args__ = (
+        db.Index('ix_comment_post_created', 'post_id', 'created_at', 'id'),
+        db.Index('ix_comment_author_id', 'author_id'),
+    )
+
     def __repr__(self):
         return f'<Comment {self.id} on Post {self.post_id}>'
     
@@ -119,6 +221,8 @@ class Report(db.Model):
     # users can only report each post once
     __table_args__ = (
         db.UniqueConstraint('reporter_id', 'post_id', name='unique_user_post_report'),
+        # the moderation queue: one status, newest first
+        db.Index('ix_report_status_created', 'status', 'created_at', 'id'),
     )
 
     def __repr__(self):
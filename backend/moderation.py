@@ -0,0 +1,207 @@
+"""Bulk moderation - changing the status of many posts/reports at once.
+
+Used by the bulk endpoints in admin.py and reports.py. Each helper locks the
+rows it was given with one SELECT ... FOR UPDATE and changes them with one
+set-based UPDATE (WHERE id IN ...), instead of a load/modify/commit per row.
+Nothing is committed here: the endpoint commits everything in one transaction
+and then calls response_cache.invalidate_posts with the posts that changed.
+
+Every bulk helper returns {id: outcome} so the admin panel can show what
+happened to each row it sent.
+
+post.pending_report_count is moved here too (change_pending_reports), with
+relative UPDATEs in the same transaction as the report change. A post that
+reaches REPORT_QUARANTINE_THRESHOLD pending reports is hidden from the feed
+(approved=False) until a moderator deals with it: deleting/expiring it, or
+dismissing the reports or restoring the post, which puts it back
+(release_posts).
+"""
+from collections import Counter
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import bindparam
+from backend.models import db, Post, Report
+from backend.search import reindex_posts, unindex_posts
+
+# most ids one bulk request can touch
+MAX_BULK_IDS = 1000
+
+# bulk post action -> status the posts end up in
+POST_ACTIONS = {'delete': 'deleted', 'expire': 'expired', 'restore': 'active'}
+# bulk report action -> what happens to the reported posts
+REPORT_ACTIONS = {'dismiss': None, 'delete_post': 'deleted', 'expire_post': 'expired'}
+# pending reports that hide a post until a moderator looks at it
+QUARANTINE_THRESHOLD = 5
+
+
+def quarantine_threshold():
+    # REPORT_QUARANTINE_THRESHOLD = 0 turns auto-quarantine off
+    return current_app.config.get('REPORT_QUARANTINE_THRESHOLD', QUARANTINE_THRESHOLD)
+
+
+def change_pending_reports(deltas):
+    """Move post.pending_report_count by {post_id: delta} and quarantine posts over the threshold.
+
+    One executemany relative UPDATE for the counters, then one UPDATE hiding
+    the posts that are now at the threshold. Nothing is committed. Returns the
+    ids of the posts this call quarantined (their cache needs invalidating
+    after the commit).
+    """
+    deltas = {post_id: delta for post_id, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+
+    db.session.execute(
+        Post.__table__.update().where(Post.id == bindparam('post_id')).values(
+            pending_report_count=Post.pending_report_count + bindparam('delta')
+        ),
+        [{'post_id': post_id, 'delta': delta} for post_id, delta in deltas.items()]
+    )
+
+    threshold = quarantine_threshold()
+    grown = [post_id for post_id, delta in deltas.items() if delta > 0]
+    if not threshold or not grown:
+        return []
+
+    # the counter UPDATE above holds the row locks, so this sees our own count
+    quarantined = [post_id for (post_id,) in db.session.query(Post.id).filter(
+        Post.id.in_(grown), Post.approved == True, Post.pending_report_count >= threshold
+    ).all()]
+    if quarantined:
+        db.session.query(Post).filter(Post.id.in_(quarantined)).update({
+            'approved': False,
+            'revision': Post.revision + 1
+        }, synchronize_session=False)
+    return quarantined
+
+
+def release_posts(post_ids):
+    """Un-hide quarantined posts that are back under the threshold.
+
+    Called when reports are dismissed and when posts are restored (a deleted
+    or expired post that got restored has had its reports dealt with). Posts
+    still at the threshold stay hidden. Returns the ids of the posts that came
+    back.
+    """
+    if not post_ids:
+        return []
+
+    threshold = quarantine_threshold()
+    filters = [Post.id.in_(post_ids), Post.approved == False]
+    # with quarantine turned off nothing should stay hidden
+    if threshold:
+        filters.append(Post.pending_report_count < threshold)
+    released = [post_id for (post_id,) in db.session.query(Post.id).filter(*filters).with_for_update().all()]
+    if released:
+        db.session.query(Post).filter(Post.id.in_(released)).update({
+            'approved': True,
+            'revision': Post.revision + 1
+        }, synchronize_session=False)
+    return released
+
+
+def parse_ids(value, name):
+    """Turn a JSON list of ids into a de-duplicated list of ints (ValueError if bad)."""
+    if not isinstance(value, list) or not value:
+        raise ValueError(f'{name} must be a non-empty list of ids')
+    if len(value) > MAX_BULK_IDS:
+        raise ValueError(f'At most {MAX_BULK_IDS} {name} per request')
+
+    ids = []
+    for row_id in value:
+        if isinstance(row_id, bool) or not isinstance(row_id, (int, str)):
+            raise ValueError(f'{name} must be a non-empty list of ids')
+        try:
+            ids.append(int(row_id))
+        except ValueError:
+            # not int()'s message, that would go straight back to the client
+            raise ValueError(f'{name} must be a non-empty list of ids') from None
+    return list(dict.fromkeys(ids))
+
+
+def set_posts_status(post_ids, status):
+    """Move posts to status ('active', 'deleted' or 'expired').
+
+    Outcomes are 'updated', 'unchanged' (already in that status) or
+    'not_found'. Changed posts get their revision bumped and are added to or
+    removed from the search index. Restoring also releases quarantined posts
+    (release_posts), which counts as 'updated' even if they were already active.
+    """
+    current = dict(db.session.query(Post.id, Post.status).filter(
+        Post.id.in_(post_ids)
+    ).with_for_update().all())
+    changed = [post_id for post_id in post_ids if post_id in current and current[post_id] != status]
+
+    changed_ids = set(changed)
+    if changed:
+        db.session.query(Post).filter(Post.id.in_(changed)).update({
+            'status': status,
+            'updated_at': datetime.utcnow(),
+            'revision': Post.revision + 1
+        }, synchronize_session=False)
+        if status == 'active':
+            reindex_posts(changed)
+        else:
+            unindex_posts(changed)
+    if status == 'active':
+        changed_ids.update(release_posts([post_id for post_id in post_ids if post_id in current]))
+
+    return {
+        post_id: 'not_found' if post_id not in current else 'updated' if post_id in changed_ids else 'unchanged'
+        for post_id in post_ids
+    }
+
+
+def pending_report_ids(post_id):
+    """Ids of the pending reports on one post (the "clear this post's reports" filter)."""
+    return [report_id for (report_id,) in db.session.query(Report.id).filter(
+        Report.post_id == post_id, Report.status == 'pending'
+    ).order_by(Report.id).all()]
+
+
+def resolve_reports(report_ids, reviewer_id, action='dismiss'):
+    """Resolve pending reports and apply action to the posts they're about.
+
+    Returns (report outcomes, post outcomes). Report outcomes are 'resolved',
+    'already_reviewed' or 'not_found'; reports that were already reviewed
+    don't touch their post. Post outcomes are the ones from set_posts_status,
+    or 'released' for quarantined posts a 'dismiss' put back.
+    """
+    current = {
+        report_id: (status, post_id)
+        for report_id, status, post_id in db.session.query(
+            Report.id, Report.status, Report.post_id
+        ).filter(Report.id.in_(report_ids)).with_for_update().all()
+    }
+    pending = [report_id for report_id in report_ids if report_id in current and current[report_id][0] == 'pending']
+
+    pending_ids = set(pending)
+    if pending:
+        db.session.query(Report).filter(Report.id.in_(pending)).update({
+            'status': 'resolved',
+            'reviewed_by': reviewer_id,
+            'reviewed_at': datetime.utcnow()
+        }, synchronize_session=False)
+
+    post_outcomes = {}
+    if pending:
+        # Counter keeps the first-seen order of the posts
+        resolved_per_post = Counter(current[report_id][1] for report_id in pending)
+        change_pending_reports({post_id: -count for post_id, count in resolved_per_post.items()})
+
+        status = REPORT_ACTIONS[action]
+        if status:
+            post_outcomes = set_posts_status(list(resolved_per_post), status)
+        else:
+            post_outcomes = {post_id: 'released' for post_id in release_posts(list(resolved_per_post))}
+
+    report_outcomes = {
+        report_id: 'not_found' if report_id not in current else 'resolved' if report_id in pending_ids else 'already_reviewed'
+        for report_id in report_ids
+    }
+    return report_outcomes, post_outcomes
+
+
+def outcome_list(outcomes):
+    # {id: outcome} -> [{'id': id, 'outcome': outcome}] in request order for the json response
+    return [{'id': row_id, 'outcome': outcome} for row_id, outcome in outcomes.items()]
@@ -0,0 +1,80 @@
+"""Password hashing on a small bounded thread pool.
+
+bcrypt is slow on purpose (~250ms at cost 12), and running it on whatever
+thread the request landed on means a burst of logins takes every core and
+every other endpoint on the worker waits behind it. Here hashing and checking
+go through a pool of BCRYPT_WORKERS threads (bcrypt releases the GIL, so they
+really do run in parallel), so at most that many cores are ever busy with it.
+At most BCRYPT_MAX_QUEUE calls can be running or waiting at once - past that
+PasswordHasherBusy is raised right away and the endpoint answers 503 instead
+of queueing up more work than it can get through.
+
+The cost comes from BCRYPT_LOG_ROUNDS. Hashes made with a different cost still
+check fine, and login rehashes them at the configured cost (needs_rehash).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+import os
+import re
+from flask_bcrypt import Bcrypt
+
+# $2b$12$... - the number is the cost
+COST_PATTERN = re.compile(r'^\$2[abxy]?\$(\d\d)\$')
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes already running or queued."""
+
+
+class PasswordHasher:
+    """bcrypt hash/check on a bounded pool, set up per app with init_app."""
+
+    def __init__(self):
+        self.bcrypt = Bcrypt()
+        self.rounds = 12
+        self.workers = 0
+        self.max_queue = 0
+        self.pool = None
+        self.slots = None
+        self.rejected = 0
+
+    def init_app(self, app):
+        self.bcrypt.init_app(app)
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.workers = app.config.get('BCRYPT_WORKERS', min(4, os.cpu_count() or 1))
+        self.max_queue = app.config.get('BCRYPT_MAX_QUEUE', self.workers * 8)
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+        # BCRYPT_WORKERS = 0 hashes on the request thread like before (no pool)
+        self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix='bcrypt') if self.workers else None
+        self.slots = BoundedSemaphore(self.max_queue) if self.workers else None
+
+    def run(self, func, *args):
+        if self.pool is None:
+            return func(*args)
+        if not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        try:
+            return self.pool.submit(func, *args).result()
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        """bcrypt hash of password at the configured cost, as a str."""
+        return self.run(self.bcrypt.generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def check(self, password_hash, password):
+        """True if password matches. Hashes that aren't bcrypt at all just don't match."""
+        try:
+            return self.run(self.bcrypt.check_password_hash, password_hash, password)
+        except ValueError:
+            return False
+
+    def needs_rehash(self, password_hash):
+        """True if the hash was made with a different cost than the configured one."""
+        match = COST_PATTERN.match(password_hash or '')
+        return match is None or int(match.group(1)) != self.rounds
+
+
+password_hasher = PasswordHasher()
@@ -1,74 +1,162 @@
 from flask import Blueprint, request, jsonify, session
-from sqlalchemy import or_, desc
-from backend.models import db, Post, User, Vote, Comment
-from backend.auth import login_required, admin_required
+from sqlalchemy import or_, and_, desc, func
+from sqlalchemy.orm import joinedload
+from backend.models import db, Post, hot_score
+from backend.auth import login_required, admin_required, can_modify
+from backend.ratelimit import rate_limit
+from backend.votes import get_user_votes
+from backend.comments import query_comment_page, format_comments
+from backend.search import apply_search, index_post, unindex_post, index_new_posts
+from backend.tags import set_post_tags, filter_by_tags, parse_tags, add_post_tags_bulk
+from backend.cache import response_cache
+from backend.conditional import make_etag, not_modified, not_modified_response, with_validators
 from datetime import datetime
+import base64
+import binascii
+import csv
+import io
+import json
+import uuid
 
 posts_bp = Blueprint('posts', __name__, url_prefix='/api/posts')
 
-@posts_bp.route('', methods=['GET'])
-def get_posts():
-    # get all the query stuff
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    search = request.args.get('search', '').strip()
-    tags = request.args.get('tags', '').strip()
-    sort_by = request.args.get('sort', 'recent')
-    print(f"Getting posts - page: {page}, search: {search}")  # debug
+# columns each feed sort orders by (all descending). id is last so the order is
+# always total, which the cursor mode needs to never skip or repeat a post
+SORT_KEYS = {
+    'recent': [Post.created_at, Post.id],
+    'popular': [Post.vote_score, Post.created_at, Post.id],
+    'trending': [Post.hot_score, Post.created_at, Post.id],
+}
+
+def encode_cursor(sort_by, post):
+    """Make an opaque cursor pointing just after `post` in the given sort."""
+    values = []
+    for column in SORT_KEYS[sort_by]:
+        value = getattr(post, column.key)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
     
+    raw = json.dumps({'sort': sort_by, 'after': values}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor, sort_by):
+    """Turn a cursor back into sort key values. Raises ValueError if it's bad."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    
+    columns = SORT_KEYS[sort_by]
+    if not isinstance(data, dict) or data.get('sort') != sort_by:
+        raise ValueError('Cursor does not match sort')
+    values = data.get('after')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Invalid cursor')
+    
+    decoded = []
+    for column, value in zip(columns, values):
+        if isinstance(column.type, db.DateTime) and isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        elif isinstance(column.type, db.Float) and isinstance(value, (int, float)):
+            value = float(value)
+        elif not isinstance(value, int):
+            raise ValueError('Invalid cursor')
+        decoded.append(value)
+    return decoded
+
+def seek_after(columns, values):
+    """WHERE clause for rows strictly after `values` in a descending multi-column order.
+
+    (a, b, c) after (x, y, z) is a < x OR (a = x AND b < y) OR (a = x AND b = y AND c < z),
+    which the database can answer by seeking into the matching composite index.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, column < values[i]))
+    return or_(*clauses)
+
+def query_feed_page(page, per_page, search, tags, tag_mode, sort_by, cursor):
+    """Run the feed query for one page. Returns (posts, pagination).
+
+    Raises ValueError for a bad cursor/sort combination.
+    """
     # only get active posts 
     query = Post.query.filter_by(status='active', approved=True)
         
-    # search stuff
+    # search stuff - goes through the full-text index (see search.py)
+    relevance = None
     if search:
-        query = query.filter(
-            or_(
-                Post.title.contains(search),
-                Post.description.contains(search),
-                Post.company.contains(search) if Post.company else False
-            )
-        )
+        query, relevance = apply_search(query, search)
         print(f"Applied search filter: {search}")  # debug
     
-    # filter by tags
+    # filter by tags (comma separated, posts need all of them unless tag_mode=any)
     if tags:
-        # split tags by comma
-        tag_list = [tag.strip() for tag in tags.split(',') if tag.strip()]
-        for tag in tag_list:
-            query = query.filter(Post.tags.contains(tag))
-        print(f"Applied tag filters: {tag_list}")  # debug
+        query = filter_by_tags(query, tags, tag_mode)
+        print(f"Applied tag filters: {tags} ({tag_mode})")  # debug
         
     # sorting
-    if sort_by == 'popular':
-        query = query.order_by(desc(Post.vote_score), desc(Post.created_at))
-        print("Sorting by popular")
-    else:  # recent is default
-        query = query.order_by(desc(Post.created_at))
-        print("Sorting by recent")
+    if sort_by == 'relevance' and relevance is not None:
+        # best match first, newest first among equally good matches
+        if cursor is not None:
+            raise ValueError('Cursor pagination is not supported for relevance sort')
+        query = query.order_by(relevance, *[desc(column) for column in SORT_KEYS['recent']])
+        print("Sorting by relevance")
+    else:
+        if sort_by not in SORT_KEYS:  # recent is default
+            sort_by = 'recent'
+        print(f"Sorting by {sort_by}")
+        query = query.order_by(*[desc(column) for column in SORT_KEYS[sort_by]])
     
-    # paginate results
-    posts_paginated = query.paginate(
-        page=page, 
-        per_page=per_page, 
-        error_out=False
-    )
-    print(f"Found {posts_paginated.total} posts total")  # debug
+    # load the authors in the same query so post.author doesnt hit the db per post
+    query = query.options(joinedload(Post.author))
     
+    # cursor mode - seek straight to the next page and skip the total count
+    if cursor is not None:
+        if cursor:
+            query = query.filter(seek_after(SORT_KEYS[sort_by], decode_cursor(cursor, sort_by)))
+        
+        # grab one extra row to know if there is another page
+        posts = query.limit(per_page + 1).all()
+        has_next = len(posts) > per_page
+        posts = posts[:per_page]
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': encode_cursor(sort_by, posts[-1]) if has_next else None,
+            'has_next': has_next
+        }
+    else:
+        # paginate results
+        posts_paginated = query.paginate(
+            page=page, 
+            per_page=per_page, 
+            error_out=False
+        )
+        print(f"Found {posts_paginated.total} posts total")  # debug
+        posts = posts_paginated.items
+        pagination = {
+            'page': posts_paginated.page,
+            'pages': posts_paginated.pages,
+            'per_page': posts_paginated.per_page,
+            'total': posts_paginated.total,
+            'has_next': posts_paginated.has_next,
+            'has_prev': posts_paginated.has_prev
+        }
+    
+    return posts, pagination
+
+def feed_validators(posts, pagination):
+    """ETag source and Last-Modified for a feed page."""
+    # the page depends on which posts are in it, their revisions and the paging info
+    etag_source = [[post.id, post.revision] for post in posts] + [pagination]
+    # newest change to any post - a post leaving the page (deleted etc) still counts
+    last_modified = db.session.query(func.max(Post.activity_at)).scalar()
+    return etag_source, last_modified
+
+def format_feed_page(posts, pagination):
+    """Format a page of posts without the per-user fields (so it can be cached)."""
     # format response
     posts_data = []
-    for post in posts_paginated.items:
-        # get user's vote if logged in
-        user_vote = None
-        if 'user_id' in session:
-            vote = Vote.query.filter_by(
-                user_id=session['user_id'], 
-                post_id=post.id
-            ).first()
-            user_vote = vote.vote_type if vote else None
-        
-        # get comment count
-        comment_count = Comment.query.filter_by(post_id=post.id).count()
-        
+    for post in posts:
         posts_data.append({
             'id': post.id,
             'title': post.title,
@@ -81,65 +169,142 @@ def get_posts():
                 'username': post.author.username
             },
             'vote_score': post.vote_score,
-            'user_vote': user_vote,
-            'comment_count': comment_count,
+            'comment_count': post.comment_count,
             'created_at': post.created_at.isoformat(),
             'updated_at': post.updated_at.isoformat()
         })
     
-    return jsonify({
+    return {
         'posts': posts_data,
-        'pagination': {
-            'page': posts_paginated.page,
-            'pages': posts_paginated.pages,
-            'per_page': posts_paginated.per_page,
-            'total': posts_paginated.total,
-            'has_next': posts_paginated.has_next,
-            'has_prev': posts_paginated.has_prev
-        }
-    }), 200
+        'pagination': pagination
+    }
+
+@posts_bp.route('', methods=['GET'])
+def get_posts():
+    # get all the query stuff
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    search = ' '.join(request.args.get('search', '').split())
+    tags = ','.join(sorted(parse_tags(request.args.get('tags', ''))))
+    tag_mode = 'any' if request.args.get('tag_mode') == 'any' else 'all'
+    sort_by = request.args.get('sort', 'recent')
+    if sort_by not in SORT_KEYS and not (sort_by == 'relevance' and search):
+        sort_by = 'recent'
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        per_page = max(1, min(per_page, 100))
+    print(f"Getting posts - page: {page}, search: {search}")  # debug
+    
+    # the anonymous version of the page is shared through the cache
+    feed_args = {
+        'page': page if cursor is None else None, 'per_page': per_page, 'search': search.lower(),
+        'tags': tags, 'tag_mode': tag_mode, 'sort': sort_by, 'cursor': cursor
+    }
+    cache_key = response_cache.feed_key(**feed_args)
+    body = response_cache.get(cache_key)
+    if body is None:
+        try:
+            posts, pagination = query_feed_page(page, per_page, search, tags, tag_mode, sort_by, cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        post_ids = [post.id for post in posts]
+        etag_source, last_modified = feed_validators(posts, pagination)
+    else:
+        post_ids = [post['id'] for post in body['posts']]
+        etag_source = body['validators']['etag_source']
+        last_modified = body['validators']['last_modified']
+    
+    # the user's own votes go on top (one query for the page). They're part of the
+    # etag too - with the vote buffer on, revision only moves when it flushes
+    user_votes = get_user_votes(session.get('user_id'), post_ids)
+    etag = make_etag(feed_args, etag_source, sorted(user_votes.items()))
+    # if the client already has this page we can stop before formatting anything
+    if not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    
+    if body is None:
+        body = format_feed_page(posts, pagination)
+        body['validators'] = {'etag_source': etag_source, 'last_modified': last_modified}
+        response_cache.set(cache_key, body)
+    
+    posts_data = [dict(post, user_vote=user_votes.get(post['id'])) for post in body['posts']]
+    
+    return with_validators(jsonify({
+        'posts': posts_data,
+        'pagination': body['pagination']
+    }), etag, last_modified), 200
+
+def validate_post_data(data):
+    """Check the fields for a new post. Returns (fields, None) or (None, error message).
+
+    Shared by create_post and the bulk import so both follow the same rules.
+    """
+    # Validate required fields
+    required_fields = ['title', 'description', 'link']
+    if not isinstance(data, dict) or not all(field in data for field in required_fields):
+        return None, 'Missing required fields'
+    
+    if not all(isinstance(data[field], str) for field in required_fields):
+        return None, 'Fields must be text'
+    
+    if not all(isinstance(data.get(field) or '', str) for field in ['company', 'tags']):
+        return None, 'Fields must be text'
+    
+    title = data['title'].strip()
+    description = data['description'].strip()
+    link = data['link'].strip()
+    company = (data.get('company') or '').strip()
+    tags = (data.get('tags') or '').strip()
+    
+    # Validate input
+    if len(title) < 5:
+        return None, 'Title must be at least 5 characters'
+    
+    if len(description) < 20:
+        return None, 'Description must be at least 20 characters'
+    
+    if not link.startswith(('http://', 'https://')):
+        return None, 'Link must be a valid URL'
+    
+    # column sizes from models.py
+    if len(title) > 200 or len(company) > 200:
+        return None, 'Title and company cannot exceed 200 characters'
+    
+    if len(link) > 500 or len(tags) > 500:
+        return None, 'Link and tags cannot exceed 500 characters'
+    
+    return {
+        'title': title,
+        'description': description,
+        'link': link,
+        'company': company if company else None,
+        'tags': tags if tags else None
+    }, None
 
 @posts_bp.route('', methods=['POST'])
 @login_required
+@rate_limit('create_post')
 def create_post():
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['title', 'description', 'link']
-        if not data or not all(field in data for field in required_fields):
-            return jsonify({'error': 'Missing required fields'}), 400
-        
-        title = data['title'].strip()
-        description = data['description'].strip()
-        link = data['link'].strip()
-        company = data.get('company', '').strip()
-        tags = data.get('tags', '').strip()
-        
-        # Validate input
-        if len(title) < 5:
-            return jsonify({'error': 'Title must be at least 5 characters'}), 400
-        
-        if len(description) < 20:
-            return jsonify({'error': 'Description must be at least 20 characters'}), 400
-        
-        if not link.startswith(('http://', 'https://')):
-            return jsonify({'error': 'Link must be a valid URL'}), 400
+        fields, error = validate_post_data(request.get_json())
+        if error:
+            return jsonify({'error': error}), 400
         
         # Create new post
         new_post = Post(
-            title=title,
-            description=description,
-            link=link,
-            company=company if company else None,
-            tags=tags if tags else None,
             author_id=session['user_id'],
             status='active',
-            approved=True
+            approved=True,
+            **fields
         )
         
         db.session.add(new_post)
+        db.session.flush()  # need the id for the search index and tags
+        index_post(new_post)
+        set_post_tags(new_post, new_post.tags)
         db.session.commit()
+        response_cache.invalidate_feed()
         
         return jsonify({
             'message': 'Post created successfully',
@@ -158,64 +323,178 @@ def create_post():
         db.session.rollback()
         return jsonify({'error': 'Failed to create post'}), 500
 
+BULK_CHUNK_SIZE = 500
+MAX_BULK_ROWS = 50000
+
+def insert_posts(values):
+    """Insert a chunk of post rows (dicts) and return their ids in the same order."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # executemany with the same compiled statement every chunk (sqlalchemy
+        # batches it into multi-row INSERTs itself), ids come back in row order
+        result = db.session.execute(
+            db.insert(Post).returning(Post.id, sort_by_parameter_order=True), values
+        )
+        return [row[0] for row in result]
+    
+    # mysql has no RETURNING, and sqlite can only keep RETURNING in row order by
+    # sending one row per statement - so tag the chunk and read its ids back.
+    # the rows get increasing ids in the order they're inserted, but another import
+    # running at the same time can take ids in between (innodb_autoinc_lock_mode = 2,
+    # the MySQL 8 default), so lastrowid..lastrowid+n isn't safe and neither is
+    # picking them out by author
+    batch = uuid.uuid4().hex
+    db.session.execute(Post.__table__.insert(), [dict(row, import_batch=batch) for row in values])
+    ids = [post_id for (post_id,) in db.session.query(Post.id).filter(
+        Post.import_batch == batch
+    ).order_by(Post.id).all()]
+    if len(ids) != len(values):
+        raise RuntimeError(f'Expected {len(values)} new post ids, found {len(ids)}')
+    return ids
+
+def ingest_posts(rows, author_id, chunk_size=BULK_CHUNK_SIZE):
+    """Validate and insert lots of posts at once.
+
+    Each chunk is one executemany INSERT plus bulk tag/search index inserts in
+    its own transaction, instead of a round trip and commit per post. Bad rows
+    are skipped and reported. Returns {'created': [ids], 'errors': [{'row', 'error'}]}.
+    """
+    created = []
+    errors = []
+    valid = []
+    for number, data in enumerate(rows, start=1):
+        fields, error = validate_post_data(data)
+        if error:
+            errors.append({'row': number, 'error': error})
+        else:
+            valid.append((number, fields))
+    
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        now = datetime.utcnow()
+        values = [dict(
+            fields, author_id=author_id, status='active', approved=True, vote_score=0,
+            comment_count=0, revision=0, created_at=now, updated_at=now, activity_at=now, hot_score=hot_score(0, now)
+        ) for _, fields in chunk]
+        
+        try:
+            ids = insert_posts(values)
+            
+            for post_id, row in zip(ids, values):
+                row['id'] = post_id
+            index_new_posts(values)
+            add_post_tags_bulk({row['id']: row['tags'] for row in values if row['tags']})
+            db.session.commit()
+            created.extend(ids)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Bulk insert chunk failed: {e}")  # debug
+            errors.extend({'row': number, 'error': 'Failed to save post'} for number, _ in chunk)
+    
+    if created:
+        response_cache.invalidate_feed()
+    errors.sort(key=lambda error: error['row'])
+    return {'created': created, 'errors': errors}
+
+def read_bulk_rows(text, content_type):
+    """Parse a bulk import body: a JSON list (or {"posts": [...]}) or CSV with a header row."""
+    if content_type == 'text/csv':
+        return list(csv.DictReader(io.StringIO(text)))
+    
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get('posts')
+    if not isinstance(data, list):
+        raise ValueError('Expected a list of posts')
+    return data
+
+@posts_bp.route('/bulk', methods=['POST'])
+@admin_required
+def bulk_create_posts():
+    # for importing big batches of postings (career fair partners etc)
+    try:
+        rows = read_bulk_rows(request.get_data(as_text=True), request.mimetype)
+    except ValueError as e:
+        return jsonify({'error': f'Could not read posts: {e}'}), 400
+    
+    if len(rows) > MAX_BULK_ROWS:
+        return jsonify({'error': f'Cannot import more than {MAX_BULK_ROWS} posts at once'}), 400
+    
+    result = ingest_posts(rows, session['user_id'])
+    return jsonify({
+        'message': f"Imported {len(result['created'])} of {len(rows)} posts",
+        'created': len(result['created']),
+        'failed': len(result['errors']),
+        'ids': result['created'],
+        'errors': result['errors']
+    }), 201 if result['created'] else 400
+
+def format_post_detail(post):
+    """Format a post and the first page of its comments, without the per-user fields."""
+    # later pages come from GET /api/comments/post/<id>?cursor=...
+    comments, comments_pagination = query_comment_page(post.id)
+    
+    return {
+        'post': {
+            'id': post.id,
+            'title': post.title,
+            'description': post.description,
+            'company': post.company,
+            'link': post.link,
+            'tags': post.tags.split(',') if post.tags else [],
+            'author': {
+                'id': post.author.id,
+                'username': post.author.username
+            },
+            'vote_score': post.vote_score,
+            'comment_count': post.comment_count,
+            'created_at': post.created_at.isoformat(),
+            'updated_at': post.updated_at.isoformat()
+        },
+        'comments': format_comments(comments),
+        'comments_pagination': comments_pagination,
+        'validators': {'revision': post.revision, 'last_modified': post.activity_at}
+    }
+
 @posts_bp.route('/<int:post_id>', methods=['GET'])
 def get_post(post_id):
     try:
-        post = Post.query.filter_by(id=post_id, status='active', approved=True).first()
-        
-        if not post:
-            return jsonify({'error': 'Post not found'}), 404
-        
-        # Get user's vote if logged in
-        user_vote = None
-        if 'user_id' in session:
-            vote = Vote.query.filter_by(
-                user_id=session['user_id'], 
-                post_id=post.id
+        cache_key = response_cache.post_key(post_id)
+        body = response_cache.get(cache_key)
+        if body is None:
+            post = Post.query.options(joinedload(Post.author)).filter_by(
+                id=post_id, status='active', approved=True
             ).first()
-            user_vote = vote.vote_type if vote else None
-        
-        # Get comments
-        comments = Comment.query.filter_by(post_id=post.id).order_by(Comment.created_at.asc()).all()
-        comments_data = []
-        for comment in comments:
-            comments_data.append({
-                'id': comment.id,
-                'content': comment.content,
-                'author': {
-                    'id': comment.author.id,
-                    'username': comment.author.username
-                },
-                'created_at': comment.created_at.isoformat(),
-                'can_edit': 'user_id' in session and (
-                    session['user_id'] == comment.author_id or 
-                    User.query.get(session['user_id']).is_admin()
-                )
-            })
-        
-        return jsonify({
-            'post': {
-                'id': post.id,
-                'title': post.title,
-                'description': post.description,
-                'company': post.company,
-                'link': post.link,
-                'tags': post.tags.split(',') if post.tags else [],
-                'author': {
-                    'id': post.author.id,
-                    'username': post.author.username
-                },
-                'vote_score': post.vote_score,
-                'user_vote': user_vote,
-                'created_at': post.created_at.isoformat(),
-                'updated_at': post.updated_at.isoformat(),
-                'can_edit': 'user_id' in session and (
-                    session['user_id'] == post.author_id or 
-                    User.query.get(session['user_id']).is_admin()
-                )
-            },
-            'comments': comments_data
-        }), 200
+            
+            if not post:
+                return jsonify({'error': 'Post not found'}), 404
+            
+            # check the client's copy before loading comments (the user's vote is in
+            # the etag since buffered votes don't move revision until they're flushed)
+            user_vote = get_user_votes(session.get('user_id'), [post_id]).get(post_id)
+            etag = make_etag('post', post.id, post.revision, user_vote)
+            if not_modified(etag, post.activity_at):
+                return not_modified_response(etag, post.activity_at)
+            
+            body = format_post_detail(post)
+            response_cache.set(cache_key, body)
+        else:
+            user_vote = get_user_votes(session.get('user_id'), [post_id]).get(post_id)
+            etag = make_etag('post', post_id, body['validators']['revision'], user_vote)
+            if not_modified(etag, body['validators']['last_modified']):
+                return not_modified_response(etag, body['validators']['last_modified'])
+        
+        return with_validators(jsonify({
+            'post': dict(
+                body['post'],
+                user_vote=user_vote,
+                can_edit=can_modify(body['post']['author']['id'])
+            ),
+            'comments': [
+                dict(comment, can_edit=can_modify(comment['author']['id']))
+                for comment in body['comments']
+            ],
+            'comments_pagination': body['comments_pagination']
+        }), etag, body['validators']['last_modified']), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch post'}), 500
@@ -230,8 +509,7 @@ def update_post(post_id):
             return jsonify({'error': 'Post not found'}), 404
         
         # Check permission
-        user = User.query.get(session['user_id'])
-        if post.author_id != session['user_id'] and not user.is_admin():
+        if not can_modify(post.author_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         data = request.get_json()
@@ -262,9 +540,13 @@ def update_post(post_id):
         
         if 'tags' in data:
             post.tags = data['tags'].strip() if data['tags'] else None
+            set_post_tags(post, post.tags)
         
         post.updated_at = datetime.utcnow()
+        post.touch()
+        index_post(post)
         db.session.commit()
+        response_cache.invalidate_post(post.id)
         
         return jsonify({
             'message': 'Post updated successfully',
@@ -293,14 +575,16 @@ def delete_post(post_id):
             return jsonify({'error': 'Post not found'}), 404
         
         # Check permission
-        user = User.query.get(session['user_id'])
-        if post.author_id != session['user_id'] and not user.is_admin():
+        if not can_modify(post.author_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         # Mark as deleted instead of actually deleting
         post.status = 'deleted'
         post.updated_at = datetime.utcnow()
+        post.touch()
+        unindex_post(post.id)
         db.session.commit()
+        response_cache.invalidate_post(post.id)
         
         return jsonify({'message': 'Post deleted successfully'}), 200
         
@@ -0,0 +1,196 @@
+"""Per-endpoint request rate limiting (token bucket).
+
+Each limited endpoint gets a bucket per user (or per IP for logged out
+endpoints like login) that holds up to N tokens and refills at N per period.
+A request takes a token, and when the bucket is empty the endpoint answers 429
+with Retry-After set to when the next token is due.
+
+    @posts_bp.route('', methods=['POST'])
+    @login_required
+    @rate_limit('create_post')
+    def create_post(): ...
+
+Limits live in DEFAULT_LIMITS and can be changed with app.config['RATELIMITS'].
+The default backend is in-process (a dict and a lock - a check is a couple of
+microseconds), so with several workers each one counts on its own and a client
+can get N requests per worker. SQLiteBackend shares the buckets between the
+workers on one machine through a small SQLite file. Anything else (redis etc)
+can implement RateLimitBackend.
+"""
+from collections import OrderedDict
+from threading import Lock, local
+import math
+import sqlite3
+import time
+from flask import request, session, jsonify
+
+# endpoint -> "count/period". login/signup are per IP, the rest per user
+DEFAULT_LIMITS = {
+    'login': '10/minute',
+    'signup': '5/hour',
+    'create_post': '20/hour',
+    'create_comment': '30/minute',
+    'create_report': '10/hour',
+    'vote': '60/minute',
+}
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(limit):
+    """'10/minute' -> (10 tokens, refill rate in tokens per second)."""
+    count, period = limit.split('/')
+    count = int(count)
+    return count, count / PERIODS[period.strip()]
+
+
+class RateLimitBackend:
+    """Bucket storage interface for RateLimiter. Implement this for a shared store."""
+
+    def take(self, key, capacity, rate, now):
+        """Take a token from the bucket at key.
+
+        Returns 0 if the request is allowed, otherwise how many seconds until
+        the next token. Has to be atomic per key.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+def refill(tokens, updated, capacity, rate, now):
+    # a missing bucket is a full one
+    if tokens is None:
+        return float(capacity)
+    return min(float(capacity), tokens + (now - updated) * rate)
+
+
+class MemoryBackend(RateLimitBackend):
+    """Buckets in a dict, for one process.
+
+    Kept in least recently used order so going over max_keys just drops the
+    oldest bucket (O(1)) instead of scanning them all under the lock. A dropped
+    bucket comes back full, so keep max_keys well above the number of clients
+    active within a refill period.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # key -> (tokens, updated), least recently used first
+        self.lock = Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (None, now))
+            tokens = refill(tokens, updated, capacity, rate, now)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            self.buckets[key] = (tokens - 1 if not wait else tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class SQLiteBackend(RateLimitBackend):
+    """Buckets in a SQLite file, shared by every worker process on the machine."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = local()  # one connection per thread
+        with self.connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+            )
+
+    def connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # losing a few buckets on a crash is fine
+            self.local.conn = conn
+        return conn
+
+    def take(self, key, capacity, rate, now):
+        conn = self.connect()
+        # IMMEDIATE takes the write lock up front so two workers can't both spend the last token
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens = refill(row[0] if row else None, row[1] if row else now, capacity, rate, now)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            conn.execute(
+                'INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)',
+                (key, tokens - 1 if not wait else tokens, now)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def clear(self):
+        self.connect().execute('DELETE FROM bucket')
+
+
+class RateLimiter:
+    """Checks requests against the configured limits, set up per app with init_app."""
+
+    def __init__(self):
+        self.backend = None
+        self.enabled = False
+        self.limits = {}
+        self.limited = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATELIMIT_ENABLED', True)
+        self.backend = app.config.get('RATELIMIT_BACKEND') or MemoryBackend()
+        limits = dict(DEFAULT_LIMITS, **app.config.get('RATELIMITS', {}))
+        # parsed once here so a check is just the bucket math
+        self.limits = {name: parse_limit(limit) for name, limit in limits.items()}
+        self.limited = 0
+
+    def check(self, name, identity):
+        """0 if the request can go ahead, else seconds to wait."""
+        if not self.enabled or name not in self.limits:
+            return 0
+        capacity, rate = self.limits[name]
+        wait = self.backend.take(f'{name}:{identity}', capacity, rate, time.time())
+        if wait:
+            self.limited += 1
+        return wait
+
+
+rate_limiter = RateLimiter()
+
+def init_rate_limiter(app):
+    rate_limiter.init_app(app)
+
+
+def client_ip():
+    # behind a proxy set up ProxyFix so remote_addr is the real client
+    return request.remote_addr or 'unknown'
+
+
+def rate_limit(name, by='user'):
+    """Limit an endpoint using the DEFAULT_LIMITS/RATELIMITS entry called name.
+
+    by='user' counts per logged in user (falls back to IP for anonymous
+    requests), by='ip' always counts per IP. Put it under login_required.
+    """
+    def decorator(f):
+        def decorated_function(*args, **kwargs):
+            user_id = session.get('user_id') if by == 'user' else None
+            identity = f'user:{user_id}' if user_id else f'ip:{client_ip()}'
+            wait = rate_limiter.check(name, identity)
+            if wait:
+                response = jsonify({'error': 'Too many requests, please slow down'})
+                response.headers['Retry-After'] = str(max(1, math.ceil(wait)))
+                return response, 429
+            return f(*args, **kwargs)
+        decorated_function.__name__ = f.__name__
+        return decorated_function
+    return decorator
@@ -0,0 +1,245 @@
+"""
+Checks the denormalized counters on post against the real rows and fixes drift
+post.comment_count is kept up to date by comments.py, post.upvotes/downvotes/
+vote_score by votes.py and post.pending_report_count by reports.py, this is for
+backfilling them on an existing database
+(run backend/migrate_schema.py first) or fixing them if they ever drift
+Also looks for comments/votes/reports pointing at posts or users that don't exist
+
+Walks tables in primary key chunks with one grouped query per chunk and a
+commit after each, so it can run against the live database (e.g. nightly from
+cron). --pause sleeps between chunks to give normal traffic the locks back.
+Safe to run more than once, only posts whose count is wrong get written
+
+    python3 backend/repair_counters.py [--batch-size 1000] [--pause 0.05] [--delete-orphans]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models import db, User, Post, Comment, Vote, Report, hot_score
+from backend.comments import get_comment_counts
+from backend.votes import get_vote_counts
+
+BATCH_SIZE = 1000
+
+# child rows that have to point at an existing post/user: (model, column, parent model)
+REFERENCES = [
+    (Comment, Comment.post_id, Post),
+    (Comment, Comment.author_id, User),
+    (Vote, Vote.post_id, Post),
+    (Vote, Vote.user_id, User),
+    (Report, Report.post_id, Post),
+    (Report, Report.reporter_id, User),
+    (Report, Report.reviewed_by, User),
+]
+
+def post_chunks(columns, batch_size=BATCH_SIZE, pause=0):
+    """Yield rows of (Post.id, *columns) a batch at a time in id order.
+
+    Commits after each batch so nothing holds locks between chunks, then waits
+    `pause` seconds before reading the next one.
+    """
+    last_id = 0
+    while True:
+        rows = db.session.query(Post.id, *columns).filter(
+            Post.id > last_id
+        ).order_by(Post.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        yield rows
+        db.session.commit()
+        last_id = rows[-1][0]
+        if pause:
+            time.sleep(pause)
+
+def repair_comment_counts(batch_size=BATCH_SIZE, pause=0):
+    """Fix post.comment_count for every post. Returns {post_id: (old, new)} for the ones changed."""
+    fixed = {}
+    for rows in post_chunks([Post.comment_count], batch_size, pause):
+        counts = get_comment_counts([post_id for post_id, _ in rows])
+        for post_id, stored in rows:
+            actual = counts.get(post_id, 0)
+            if stored != actual:
+                # relative, so a comment committed since this chunk was read isn't
+                # written over. bump the revision too so ETags/caches notice
+                db.session.query(Post).filter(Post.id == post_id).update(
+                    {'comment_count': Post.comment_count + (actual - stored), 'revision': Post.revision + 1},
+                    synchronize_session=False
+                )
+                fixed[post_id] = (stored, actual)
+
+    return fixed
+
+def repair_vote_counts(batch_size=BATCH_SIZE, pause=0):
+    """Fix post.upvotes/downvotes/vote_score (and hot_score with them) for every post.
+
+    Returns {post_id: (old, new)} with (upvotes, downvotes) pairs for the posts
+    that changed.
+    """
+    fixed = {}
+    columns = [Post.upvotes, Post.downvotes, Post.vote_score]
+    for rows in post_chunks(columns, batch_size, pause):
+        counts = get_vote_counts([row.id for row in rows])
+        changed = []
+        for post_id, upvotes, downvotes, vote_score in rows:
+            actual = counts.get(post_id, (0, 0))
+            if (upvotes, downvotes) != actual or vote_score != actual[0] - actual[1]:
+                # deltas rather than the numbers we counted - votes committed
+                # after this chunk was read (e.g. on REPEATABLE READ) still count
+                db.session.query(Post).filter(Post.id == post_id).update({
+                    'upvotes': Post.upvotes + (actual[0] - upvotes),
+                    'downvotes': Post.downvotes + (actual[1] - downvotes),
+                    'vote_score': Post.vote_score + (actual[0] - actual[1] - vote_score),
+                    'revision': Post.revision + 1
+                }, synchronize_session=False)
+                fixed[post_id] = ((upvotes, downvotes), actual)
+                changed.append(post_id)
+
+        if changed:
+            # hot_score from the score as it is now, the UPDATEs above hold the row locks
+            rows = db.session.query(Post.id, Post.vote_score, Post.created_at).filter(
+                Post.id.in_(changed)
+            ).all()
+            for post_id, vote_score, created_at in rows:
+                db.session.query(Post).filter(Post.id == post_id).update(
+                    {'hot_score': hot_score(vote_score, created_at)}, synchronize_session=False
+                )
+
+    return fixed
+
+def get_pending_report_counts(post_ids):
+    # {post_id: pending reports} for one chunk, posts without any are left out
+    rows = db.session.query(Report.post_id, db.func.count(Report.id)).filter(
+        Report.post_id.in_(post_ids), Report.status == 'pending'
+    ).group_by(Report.post_id).all()
+    return dict(rows)
+
+def repair_report_counts(batch_size=BATCH_SIZE, pause=0):
+    """Fix post.pending_report_count for every post. Returns {post_id: (old, new)} for the ones changed.
+
+    Only the counter is fixed - posts aren't quarantined or released here.
+    """
+    fixed = {}
+    for rows in post_chunks([Post.pending_report_count], batch_size, pause):
+        counts = get_pending_report_counts([post_id for post_id, _ in rows])
+        for post_id, stored in rows:
+            actual = counts.get(post_id, 0)
+            if stored != actual:
+                db.session.query(Post).filter(Post.id == post_id).update(
+                    {'pending_report_count': Post.pending_report_count + (actual - stored)},
+                    synchronize_session=False
+                )
+                fixed[post_id] = (stored, actual)
+
+    return fixed
+
+def find_orphans(batch_size=BATCH_SIZE, pause=0):
+    """Find comments/votes/reports whose post or user is missing.
+
+    Returns {'comment.post_id': [ids], ...} with only the references that have
+    orphans. Each check is a LEFT JOIN over one id range of the child table
+    at a time.
+    """
+    orphans = {}
+    for model, column, parent in REFERENCES:
+        found = []
+        last_id = 0
+        max_id = db.session.query(db.func.max(model.id)).scalar() or 0
+        while last_id < max_id:
+            found += [row_id for (row_id,) in db.session.query(model.id).outerjoin(
+                parent, parent.id == column
+            ).filter(
+                model.id > last_id,
+                model.id <= last_id + batch_size,
+                column.isnot(None),
+                parent.id.is_(None)
+            ).all()]
+            db.session.commit()
+            last_id += batch_size
+            if pause:
+                time.sleep(pause)
+        if found:
+            orphans[f'{model.__tablename__}.{column.key}'] = found
+
+    return orphans
+
+def delete_orphans(orphans):
+    """Fix the rows find_orphans() found. Returns how many rows changed.
+
+    Rows are deleted when the missing parent is required (a comment's post,
+    a vote's user...). Optional references like report.reviewed_by are set
+    to NULL instead, so the report and its history stay.
+    """
+    references = {f'{model.__tablename__}.{column.key}': (model, column) for model, column, _ in REFERENCES}
+    deleted = 0
+    for reference, row_ids in orphans.items():
+        model, column = references[reference]
+        for start in range(0, len(row_ids), BATCH_SIZE):
+            rows = db.session.query(model).filter(model.id.in_(row_ids[start:start + BATCH_SIZE]))
+            if column.nullable:
+                deleted += rows.update({column.key: None}, synchronize_session=False)
+            else:
+                deleted += rows.delete(synchronize_session=False)
+            db.session.commit()
+    return deleted
+
+def run_checks(batch_size=BATCH_SIZE, pause=0, fix_orphans=False):
+    """Everything the scheduled job does, returned as a report dict."""
+    report = {'orphans': find_orphans(batch_size, pause), 'orphans_deleted': 0}
+    # orphans go first - a vote from a deleted user still counts until it's removed
+    if fix_orphans and report['orphans']:
+        report['orphans_deleted'] = delete_orphans(report['orphans'])
+    report['comment_counts'] = repair_comment_counts(batch_size, pause)
+    report['vote_counts'] = repair_vote_counts(batch_size, pause)
+    report['report_counts'] = repair_report_counts(batch_size, pause)
+    return report
+
+if __name__ == '__main__':
+    import argparse
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Check and repair post counters and orphaned rows')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--pause', type=float, default=0.0, help='seconds to sleep between chunks')
+    parser.add_argument('--delete-orphans', action='store_true',
+                        help='delete orphaned comments/votes/reports (a missing reviewer is just cleared)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        report = run_checks(args.batch_size, args.pause, args.delete_orphans)
+
+        print("Comment counts:")
+        for post_id, (old, new) in sorted(report['comment_counts'].items()):
+            print(f"  post {post_id}: {old} -> {new}")
+        print(f"  fixed {len(report['comment_counts'])} posts")
+
+        print("Vote counts:")
+        for post_id, (old, new) in sorted(report['vote_counts'].items()):
+            print(f"  post {post_id}: {old[0]} up/{old[1]} down -> {new[0]} up/{new[1]} down")
+        print(f"  fixed {len(report['vote_counts'])} posts")
+
+        print("Pending report counts:")
+        for post_id, (old, new) in sorted(report['report_counts'].items()):
+            print(f"  post {post_id}: {old} -> {new}")
+        print(f"  fixed {len(report['report_counts'])} posts")
+
+        print("Orphaned rows:")
+        for reference, row_ids in sorted(report['orphans'].items()):
+            shown = ', '.join(str(row_id) for row_id in row_ids[:20])
+            more = f' (+{len(row_ids) - 20} more)' if len(row_ids) > 20 else ''
+            print(f"  {reference} -> missing: {len(row_ids)} rows ({shown}{more})")
+        if not report['orphans']:
+            print("  none")
+        elif args.delete_orphans:
+            print(f"  deleted {report['orphans_deleted']} rows (missing reviewers are cleared instead)")
+        else:
+            print("  run with --delete-orphans to remove them")
+
+        print(f"Done in {time.perf_counter() - start:.1f}s")
@@ -1,12 +1,25 @@
 from flask import Blueprint, request, jsonify, session
-from backend.models import db, Post, Report, User
-from backend.auth import login_required, admin_required
+from sqlalchemy.orm import joinedload, contains_eager
+from backend.models import db, Post, Report
+from backend.auth import login_required, admin_required, can_modify
+from backend.ratelimit import rate_limit
+from backend.search import unindex_post
+from backend.cache import response_cache
+from backend.moderation import (
+    REPORT_ACTIONS, parse_ids, pending_report_ids, resolve_reports, outcome_list,
+    change_pending_reports, release_posts
+)
 from datetime import datetime
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/api/reports')
 
+REPORT_STATUSES = ['pending', 'resolved', 'dismissed']
+# biggest page the moderation queue will return
+MAX_PER_PAGE = 100
+
 @reports_bp.route('', methods=['POST'])
 @login_required
+@rate_limit('create_report')
 def create_report():
     try:
         data = request.get_json()
@@ -44,7 +57,11 @@ def create_report():
         )
         
         db.session.add(new_report)
+        # counted in the same transaction, hides the post if this report takes it over the threshold
+        quarantined = change_pending_reports({post.id: 1})
         db.session.commit()
+        if quarantined:
+            response_cache.invalidate_post(post.id)
         
         return jsonify({
             'message': 'Post reported successfully. Thank you for helping keep the community clean.',
@@ -65,16 +82,34 @@ def get_reports():
     try:
         # Get query parameters
         page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
-        status = request.args.get('status', 'pending')  # pending, resolved, dismissed
+        per_page = max(1, min(request.args.get('per_page', 20, type=int), MAX_PER_PAGE))
+        status = request.args.get('status', 'pending')  # pending, resolved, dismissed, all
+        # priority = most reported posts (quarantined ones included) first
+        sort_by = request.args.get('sort', 'priority' if status == 'pending' else 'recent')
+        
+        if status not in REPORT_STATUSES and status != 'all':
+            return jsonify({'error': 'Invalid status'}), 400
+        if sort_by not in ['recent', 'priority']:
+            return jsonify({'error': 'Invalid sort. Must be "recent" or "priority"'}), 400
         
-        # Build query
-        query = Report.query
-        if status and status != 'all':
-            query = query.filter_by(status=status)
+        # Build query - the post, its author, the reporter and the reviewer all
+        # come back in the same query instead of up to four lookups per report
+        query = Report.query.join(Report.post).options(
+            contains_eager(Report.post).joinedload(Post.author),
+            joinedload(Report.reporter),
+            joinedload(Report.reviewer)
+        )
+        if status != 'all':
+            query = query.filter(Report.status == status)
         
-        # Order by creation date (newest first)
-        query = query.order_by(Report.created_at.desc())
+        if sort_by == 'priority':
+            # by the post's counter, so no COUNT per post to rank them
+            query = query.order_by(
+                Post.pending_report_count.desc(), Post.id.desc(), Report.created_at.desc(), Report.id.desc()
+            )
+        else:
+            # Order by creation date (newest first), uses the (status, created_at, id) index
+            query = query.order_by(Report.created_at.desc(), Report.id.desc())
         
         # Paginate
         reports_paginated = query.paginate(
@@ -95,7 +130,9 @@ def get_reports():
                         'id': report.post.author.id,
                         'username': report.post.author.username
                     },
-                    'status': report.post.status
+                    'status': report.post.status,
+                    'approved': report.post.approved,
+                    'pending_report_count': report.post.pending_report_count
                 },
                 'reporter': {
                     'id': report.reporter.id,
@@ -141,6 +178,9 @@ def resolve_report(report_id):
         if action not in ['dismiss', 'delete_post', 'expire_post']:
             return jsonify({'error': 'Invalid action'}), 400
         
+        # only a pending report still counts towards the post
+        was_pending = report.status == 'pending'
+        
         # Update report status
         report.status = 'resolved'
         report.reviewed_by = session['user_id']
@@ -151,11 +191,23 @@ def resolve_report(report_id):
         if action == 'delete_post':
             post.status = 'deleted'
             post.updated_at = datetime.utcnow()
+            post.touch()
+            unindex_post(post.id)
         elif action == 'expire_post':
             post.status = 'expired'
             post.updated_at = datetime.utcnow()
+            post.touch()
+            unindex_post(post.id)
+        
+        released = []
+        if was_pending:
+            change_pending_reports({post.id: -1})
+            if action == 'dismiss':
+                released = release_posts([post.id])
         
         db.session.commit()
+        if action != 'dismiss' or released:
+            response_cache.invalidate_post(post.id)
         
         return jsonify({
             'message': f'Report resolved. Action taken: {action.replace("_", " ")}',
@@ -170,6 +222,54 @@ def resolve_report(report_id):
         db.session.rollback()
         return jsonify({'error': 'Failed to resolve report'}), 500
 
+@reports_bp.route('/bulk-resolve', methods=['POST'])
+@admin_required
+def bulk_resolve_reports():
+    """Resolve many reports (and act on their posts) in one transaction.
+
+    POST {"report_ids": [...], "action": ...} or {"post_id": X, "action": ...}
+    for every pending report on post X. action is dismiss, delete_post or
+    expire_post like the single resolve. Every report and affected post comes
+    back with an outcome.
+    """
+    try:
+        data = request.get_json() or {}
+        action = data.get('action', 'dismiss')
+        if action not in REPORT_ACTIONS:
+            return jsonify({'error': 'Invalid action'}), 400
+        
+        if data.get('post_id') is not None:
+            if 'report_ids' in data:
+                return jsonify({'error': 'Send report_ids or post_id, not both'}), 400
+            if not isinstance(data['post_id'], int) or isinstance(data['post_id'], bool):
+                return jsonify({'error': 'post_id must be an id'}), 400
+            report_ids = pending_report_ids(data['post_id'])
+        else:
+            try:
+                report_ids = parse_ids(data.get('report_ids'), 'report_ids')
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        report_outcomes, post_outcomes = resolve_reports(report_ids, session['user_id'], action)
+        db.session.commit()
+        
+        changed_posts = [post_id for post_id, outcome in post_outcomes.items() if outcome in ('updated', 'released')]
+        if changed_posts:
+            response_cache.invalidate_posts(changed_posts)
+        
+        resolved = sum(1 for outcome in report_outcomes.values() if outcome == 'resolved')
+        return jsonify({
+            'message': f'{resolved} reports resolved. Action taken: {action.replace("_", " ")}',
+            'action': action,
+            'resolved': resolved,
+            'reports': outcome_list(report_outcomes),
+            'posts': outcome_list(post_outcomes)
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to resolve reports'}), 500
+
 @reports_bp.route('/post/<int:post_id>/mark-deleted', methods=['POST'])
 @login_required
 def mark_post_deleted(post_id):
@@ -179,15 +279,16 @@ def mark_post_deleted(post_id):
         if not post:
             return jsonify({'error': 'Post not found'}), 404
         
-        user = User.query.get(session['user_id'])
-        
         # Only post author or admin can mark as deleted
-        if post.author_id != session['user_id'] and not user.is_admin():
+        if not can_modify(post.author_id):
             return jsonify({'error': 'Permission denied'}), 403
         
         post.status = 'deleted'
         post.updated_at = datetime.utcnow()
+        post.touch()
+        unindex_post(post.id)
         db.session.commit()
+        response_cache.invalidate_post(post.id)
         
         return jsonify({
             'message': 'Post marked as deleted',
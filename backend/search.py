@@ -0,0 +1,182 @@
+"""Full-text search over posts.
+
+MySQL gets a FULLTEXT index on post(title, description, company) which InnoDB
+keeps up to date on its own. SQLite (local dev and tests) gets an FTS5 table,
+post_fts, keyed by post id - that one we have to keep in sync ourselves, so
+posts.py/admin.py/reports.py call index_post/unindex_post when a post changes.
+Any other database falls back to LIKE matching on each term.
+"""
+import re
+from sqlalchemy import event, DDL, text, bindparam, table, column, literal_column, or_, asc, desc
+from sqlalchemy.dialects.mysql import match as mysql_match
+from backend.models import db, Post
+
+# the fts5 table, only used for joins (there is no model for it)
+post_fts = table('post_fts', column('rowid'), column('title'), column('description'), column('company'))
+
+# create/drop the search index alongside the post table
+event.listen(Post.__table__, 'after_create', DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(title, description, company, tokenize='porter unicode61')"
+).execute_if(dialect='sqlite'))
+event.listen(Post.__table__, 'after_create', DDL(
+    "CREATE FULLTEXT INDEX ft_post_text ON post (title, description, company)"
+).execute_if(dialect='mysql'))
+event.listen(Post.__table__, 'before_drop', DDL(
+    "DROP TABLE IF EXISTS post_fts"
+).execute_if(dialect='sqlite'))
+
+MAX_TERMS = 10
+# innodb_ft_min_token_size default - shorter words aren't in the FULLTEXT index
+MYSQL_MIN_TOKEN = 3
+
+
+def dialect_name():
+    return db.session.get_bind().dialect.name
+
+
+def split_terms(search):
+    """Break a search string into lowercase word terms (extra terms are dropped)."""
+    return re.findall(r'\w+', search.lower())[:MAX_TERMS]
+
+
+def apply_search(query, search):
+    """Filter a Post query down to posts matching every term in `search`.
+
+    Terms are prefix matched, so "intern" finds "internship". Returns the new
+    query and an ORDER BY clause for best-match-first (None when the database
+    can't rank results).
+    """
+    terms = split_terms(search)
+    if not terms:
+        return query, None
+
+    dialect = dialect_name()
+
+    if dialect == 'sqlite':
+        # "term"* is a prefix match, space between them means AND
+        fts_query = ' '.join(f'"{term}"*' for term in terms)
+        query = query.join(post_fts, post_fts.c.rowid == Post.id).filter(
+            text('post_fts MATCH :fts_query').bindparams(fts_query=fts_query)
+        )
+        # bm25 is lower-is-better
+        return query, asc(literal_column('bm25(post_fts)'))
+
+    if dialect == 'mysql':
+        long_terms = [term for term in terms if len(term) >= MYSQL_MIN_TOKEN]
+        short_terms = [term for term in terms if len(term) < MYSQL_MIN_TOKEN]
+
+        # short words like "go" or "ui" aren't indexed so they have to use LIKE,
+        # but the MATCH on the other terms has already narrowed things down
+        query = like_search(query, short_terms)
+        if not long_terms:
+            return query, None
+
+        # +term* means the term is required and prefix matched
+        relevance = mysql_match(
+            Post.title, Post.description, Post.company,
+            against=' '.join(f'+{term}*' for term in long_terms)
+        ).in_boolean_mode()
+        return query.filter(relevance), desc(relevance)
+
+    return like_search(query, terms), None
+
+
+def like_search(query, terms):
+    # old style substring search, every term has to show up somewhere
+    for term in terms:
+        query = query.filter(
+            or_(
+                Post.title.contains(term),
+                Post.description.contains(term),
+                Post.company.contains(term)
+            )
+        )
+    return query
+
+
+def index_post(post):
+    """Add or refresh a post in the search index. Call before committing the change."""
+    if dialect_name() != 'sqlite':
+        return
+
+    db.session.execute(text('DELETE FROM post_fts WHERE rowid = :id'), {'id': post.id})
+    if post.status != 'active':
+        return
+    db.session.execute(
+        text('INSERT INTO post_fts (rowid, title, description, company) VALUES (:id, :title, :description, :company)'),
+        {'id': post.id, 'title': post.title, 'description': post.description, 'company': post.company or ''}
+    )
+
+
+def index_new_posts(rows):
+    """Bulk version of index_post for brand new active posts (dicts with id/title/description/company)."""
+    if dialect_name() != 'sqlite' or not rows:
+        return
+
+    db.session.execute(
+        text('INSERT INTO post_fts (rowid, title, description, company) VALUES (:id, :title, :description, :company)'),
+        [{'id': row['id'], 'title': row['title'], 'description': row['description'],
+          'company': row['company'] or ''} for row in rows]
+    )
+
+
+def unindex_post(post_id):
+    """Remove a post from the search index (deleted/expired posts can't be searched)."""
+    if dialect_name() != 'sqlite':
+        return
+
+    db.session.execute(text('DELETE FROM post_fts WHERE rowid = :id'), {'id': post_id})
+
+
+def reindex_posts(post_ids):
+    """Bulk index_post for posts already in the database (e.g. restored ones)."""
+    if dialect_name() != 'sqlite' or not post_ids:
+        return
+
+    unindex_posts(post_ids)
+    db.session.execute(
+        text(
+            "INSERT INTO post_fts (rowid, title, description, company) "
+            "SELECT id, title, description, COALESCE(company, '') FROM post "
+            "WHERE status = 'active' AND id IN :ids"
+        ).bindparams(bindparam('ids', expanding=True)),
+        {'ids': list(post_ids)}
+    )
+
+
+def unindex_posts(post_ids):
+    """Bulk unindex_post."""
+    if dialect_name() != 'sqlite' or not post_ids:
+        return
+
+    db.session.execute(
+        text('DELETE FROM post_fts WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True)),
+        {'ids': list(post_ids)}
+    )
+
+
+def rebuild_search_index():
+    """Create the search index if it's missing and reload it from the post table.
+
+    Needed once for databases created before search existed.
+    """
+    dialect = dialect_name()
+
+    if dialect == 'sqlite':
+        db.session.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(title, description, company, tokenize='porter unicode61')"
+        ))
+        db.session.execute(text('DELETE FROM post_fts'))
+        db.session.execute(text(
+            "INSERT INTO post_fts (rowid, title, description, company) "
+            "SELECT id, title, description, COALESCE(company, '') FROM post WHERE status = 'active'"
+        ))
+    elif dialect == 'mysql':
+        exists = db.session.execute(text(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'post' AND index_name = 'ft_post_text'"
+        )).scalar()
+        if not exists:
+            db.session.execute(text('CREATE FULLTEXT INDEX ft_post_text ON post (title, description, company)'))
+
+    db.session.commit()
@@ -0,0 +1,104 @@
+"""Tag helpers.
+
+Posts keep the comma separated tag string the author typed (that's what the
+API returns), and the normalized names also go into tag/post_tag so filtering
+can use the (tag_id, post_id) index instead of a LIKE scan. Anything that sets
+post.tags should call set_post_tags so the two stay in sync.
+"""
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from backend.models import db, Post, Tag, post_tag
+
+
+def normalize_tag(name):
+    return ' '.join(name.split()).lower()
+
+
+def parse_tags(tags):
+    """Split a comma separated tag string into unique normalized names (in order)."""
+    names = []
+    for name in (tags or '').split(','):
+        # cut to the column size before comparing, or two long tags that only
+        # differ after 100 characters would end up as the same name twice
+        name = normalize_tag(name)[:100].rstrip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def insert_missing_tags(names):
+    # INSERT the names, skipping ones that already exist (someone else may be
+    # creating the same tag right now) instead of failing on the unique name
+    rows = [{'name': name} for name in names]
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        stmt = mysql_insert(Tag.__table__).prefix_with('IGNORE')
+    elif dialect == 'sqlite':
+        stmt = sqlite_insert(Tag.__table__).on_conflict_do_nothing(index_elements=['name'])
+    elif dialect == 'postgresql':
+        stmt = postgresql_insert(Tag.__table__).on_conflict_do_nothing(index_elements=['name'])
+    else:
+        stmt = Tag.__table__.insert()
+    db.session.execute(stmt, rows)
+
+
+def get_or_create_tags(names):
+    """Return {name: Tag} for the given normalized names, creating missing ones."""
+    if not names:
+        return {}
+
+    tags = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names)).all()}
+    missing = [name for name in names if name not in tags]
+    if missing:
+        insert_missing_tags(missing)
+        # read them back - the ids may be ours or from a concurrent insert
+        tags.update({tag.name: tag for tag in Tag.query.filter(Tag.name.in_(missing)).all()})
+    return tags
+
+
+def set_post_tags(post, tags):
+    """Replace a post's rows in post_tag with the tags in `tags`. Doesn't commit."""
+    names = parse_tags(tags)
+    tags_by_name = get_or_create_tags(names)
+
+    db.session.execute(post_tag.delete().where(post_tag.c.post_id == post.id))
+    if names:
+        db.session.execute(post_tag.insert(), [
+            {'post_id': post.id, 'tag_id': tags_by_name[name].id} for name in names
+        ])
+
+
+def add_post_tags_bulk(tags_by_post):
+    """Bulk version of set_post_tags for new posts: {post_id: tag string}. Doesn't commit."""
+    names_by_post = {post_id: parse_tags(tags) for post_id, tags in tags_by_post.items()}
+    all_names = sorted({name for names in names_by_post.values() for name in names})
+    tags_by_name = get_or_create_tags(all_names)
+
+    rows = [
+        {'post_id': post_id, 'tag_id': tags_by_name[name].id}
+        for post_id, names in names_by_post.items() for name in names
+    ]
+    if rows:
+        db.session.execute(post_tag.insert(), rows)
+
+
+def filter_by_tags(query, tags, match='all'):
+    """Limit a Post query to posts with all (or any) of the comma separated tags.
+
+    The post ids come from the post_tag index, so this never looks at post.tags.
+    """
+    names = parse_tags(tags)
+    if not names:
+        return query
+
+    tagged = db.session.query(post_tag.c.post_id).join(
+        Tag, Tag.id == post_tag.c.tag_id
+    ).filter(Tag.name.in_(names))
+
+    if match != 'any':
+        # a post has every tag when it shows up once per tag
+        tagged = tagged.group_by(post_tag.c.post_id).having(func.count() == len(names))
+
+    return query.filter(Post.id.in_(tagged))
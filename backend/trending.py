@@ -0,0 +1,55 @@
+"""
+Recomputes post.hot_score (the sort=trending score) for every post
+Votes keep hot_score up to date as they happen and the score doesn't change
+just because time passes (see hot_score in models.py), so this is for
+backfilling the column and for after TRENDING_WINDOW/TRENDING_EPOCH change.
+Cheap enough to run from cron, e.g. nightly:
+
+    0 4 * * * cd /path/to/project-team-rocket && venv/bin/python3 backend/trending.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.models import db, Post, hot_score
+
+BATCH_SIZE = 1000
+
+def recompute_hot_scores(batch_size=BATCH_SIZE):
+    """Rewrite hot_score where it's wrong. Returns how many posts changed.
+
+    Walks posts in id order a batch at a time and writes each batch with one
+    executemany, so it doesn't hold locks across the table.
+    """
+    changed = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(
+            Post.id, Post.vote_score, Post.created_at, Post.hot_score, Post.activity_at
+        ).filter(Post.id > last_id).order_by(Post.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        updates = []
+        for post_id, vote_score, created_at, stored, activity_at in rows:
+            score = hot_score(vote_score, created_at)
+            if stored != score:
+                # pass activity_at through so onupdate doesn't touch it - nothing visible changed
+                updates.append({'id': post_id, 'hot_score': score, 'activity_at': activity_at})
+        if updates:
+            db.session.execute(db.update(Post), updates)
+        db.session.commit()
+
+        changed += len(updates)
+        last_id = rows[-1][0]
+
+    return changed
+
+if __name__ == '__main__':
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        print("Recomputing trending scores...")
+        print(f"Updated {recompute_hot_scores()} posts!")
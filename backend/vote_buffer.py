@@ -0,0 +1,176 @@
+"""Optional write-behind buffer for vote counters.
+
+Normally every vote moves post.upvotes/downvotes/vote_score in the same
+transaction as the vote row (Post.apply_vote), so a post getting hundreds of
+votes a second has every request queued up on that one row lock. With
+VOTE_BUFFER_ENABLED the vote row is still committed right away, but the
+counter deltas are added up in memory per post and written with one batched
+UPDATE every VOTE_BUFFER_FLUSH_MS milliseconds, or sooner once
+VOTE_BUFFER_MAX_EVENTS votes are waiting. Flushes always run on the background
+thread, never in the vote request (its vote is already committed by then, so
+a failed flush mustn't turn it into a 500).
+
+Staleness: stored counters (and so vote_score/hot_score in feeds, sorting and
+ETags) lag the vote rows by at most one flush interval plus however long a
+flush takes. The vote response itself adds the pending delta back on so the
+voter sees their own vote straight away, and the feed/post ETags include the
+viewer's own votes so they never get a 304 for a page showing their old one.
+
+Each worker process has its own buffer. Deltas just add up so that's fine,
+and pending deltas are flushed on shutdown (atexit). If a process dies
+without flushing, the vote rows are still there and
+backend/repair_counters.py puts the counters right.
+"""
+import atexit
+from threading import Lock, Thread, Event
+from sqlalchemy import bindparam
+from backend.models import db, Post, hot_score
+from backend.cache import response_cache
+
+
+class VoteBuffer:
+    """Per-process buffer of vote counter deltas, set up per app with init_app."""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = False
+        self.flush_ms = 500
+        self.max_events = 200
+        self.pending = {}  # post_id -> [upvotes delta, downvotes delta]
+        self.events = 0
+        self.flushes = 0
+        self.lock = Lock()
+        # only one flush at a time, so a slow one can't race the next with the same post
+        self.flush_lock = Lock()
+        self.thread = None
+        self.stopping = Event()
+        self.wake = Event()  # set to flush now instead of waiting out the interval
+        self.registered = False
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('VOTE_BUFFER_ENABLED', False)
+        self.flush_ms = app.config.get('VOTE_BUFFER_FLUSH_MS', 500)
+        self.max_events = app.config.get('VOTE_BUFFER_MAX_EVENTS', 200)
+        if self.enabled and not self.registered:
+            atexit.register(self.shutdown)
+            self.registered = True
+
+    def add(self, post_id, old_vote, new_vote):
+        """Queue the counter change for one user's vote going from old_vote to new_vote."""
+        up = (new_vote == 'up') - (old_vote == 'up')
+        down = (new_vote == 'down') - (old_vote == 'down')
+        with self.lock:
+            delta = self.pending.setdefault(post_id, [0, 0])
+            delta[0] += up
+            delta[1] += down
+            self.events += 1
+            full = self.events >= self.max_events
+
+        self.start()
+        if full:
+            # the background thread does it - the caller's vote is already committed
+            self.wake.set()
+
+    def pending_delta(self, post_id):
+        """(upvotes, downvotes) not written to the post row yet."""
+        with self.lock:
+            up, down = self.pending.get(post_id, (0, 0))
+        return up, down
+
+    def flush(self):
+        """Write all pending deltas with one batched UPDATE. Returns how many posts changed.
+
+        Needs an app context (the background thread makes its own).
+        """
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+                self.events = 0
+
+            deltas = [
+                {'post_id': post_id, 'up': up, 'down': down}
+                for post_id, (up, down) in pending.items() if up or down
+            ]
+            if not deltas:
+                return 0
+
+            try:
+                # relative updates, so other workers flushing the same post at once is fine
+                db.session.execute(
+                    Post.__table__.update().where(Post.id == bindparam('post_id')).values(
+                        upvotes=Post.upvotes + bindparam('up'),
+                        downvotes=Post.downvotes + bindparam('down'),
+                        vote_score=Post.vote_score + bindparam('up') - bindparam('down'),
+                        revision=Post.revision + 1
+                    ),
+                    deltas
+                )
+                post_ids = [delta['post_id'] for delta in deltas]
+                rows = db.session.query(Post.id, Post.vote_score, Post.created_at).filter(
+                    Post.id.in_(post_ids)
+                ).all()
+                db.session.execute(
+                    Post.__table__.update().where(Post.id == bindparam('post_id')).values(
+                        hot_score=bindparam('score')
+                    ),
+                    [{'post_id': post_id, 'score': hot_score(vote_score, created_at)}
+                     for post_id, vote_score, created_at in rows]
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # put the deltas back so the next flush tries them again
+                with self.lock:
+                    for post_id, (up, down) in pending.items():
+                        delta = self.pending.setdefault(post_id, [0, 0])
+                        delta[0] += up
+                        delta[1] += down
+                raise
+
+            self.flushes += 1
+            for post_id in post_ids:
+                response_cache.invalidate_post(post_id)
+            return len(deltas)
+
+    def start(self):
+        # background flusher, started on the first buffered vote
+        if self.thread is not None or self.app is None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = Thread(target=self.run, name='vote-buffer', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            self.wake.wait(self.flush_ms / 1000)
+            self.wake.clear()
+            if self.stopping.is_set():
+                break
+            try:
+                with self.app.app_context():
+                    self.flush()
+                    db.session.remove()
+            except Exception as e:
+                print(f"Vote buffer flush failed: {e}")  # debug - deltas are kept for next time
+
+    def shutdown(self):
+        """Stop the background thread and write whatever is still pending."""
+        self.stopping.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self.app is not None and self.pending:
+            with self.app.app_context():
+                self.flush()
+                db.session.remove()
+        self.stopping.clear()
+        self.wake.clear()
+
+
+vote_buffer = VoteBuffer()
+
+def init_vote_buffer(app):
+    vote_buffer.init_app(app)
@@ -1,11 +1,115 @@
 from flask import Blueprint, request, jsonify, session
+from sqlalchemy import func, case
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
 from backend.models import db, Post, Vote
 from backend.auth import login_required
+from backend.ratelimit import rate_limit
+from backend.cache import response_cache
+from backend.vote_buffer import vote_buffer
+from backend.conditional import make_etag, not_modified, not_modified_response, with_validators
 
 votes_bp = Blueprint('votes', __name__, url_prefix='/api/votes')
 
+# most post ids one /mine lookup will take
+MAX_VOTE_LOOKUP = 500
+
+def get_user_votes(user_id, post_ids):
+    """Return {post_id: vote_type} for one user over a batch of posts.
+
+    Uses a single IN query so rendering a page of posts doesn't need a vote
+    lookup per post. Anonymous users (user_id None) never have votes.
+    """
+    if not user_id or not post_ids:
+        return {}
+    
+    rows = db.session.query(Vote.post_id, Vote.vote_type).filter(
+        Vote.user_id == user_id,
+        Vote.post_id.in_(post_ids)
+    ).all()
+    return {post_id: vote_type for post_id, vote_type in rows}
+
+def get_vote_counts(post_ids):
+    """Return {post_id: (upvotes, downvotes)} for a batch of posts with one grouped query.
+
+    Only used to check/rebuild post.upvotes and post.downvotes - normal reads
+    use the columns.
+    """
+    if not post_ids:
+        return {}
+    
+    rows = db.session.query(
+        Vote.post_id,
+        func.sum(case((Vote.vote_type == 'up', 1), else_=0)),
+        func.sum(case((Vote.vote_type == 'down', 1), else_=0))
+    ).filter(Vote.post_id.in_(post_ids)).group_by(Vote.post_id).all()
+    return {post_id: (int(up), int(down)) for post_id, up, down in rows}
+
+def insert_vote_if_missing(user_id, post_id, vote_type):
+    """INSERT the vote unless the user already has one on the post. True if it went in.
+
+    Conflicts on unique_user_post_vote are skipped by the database instead of
+    raising, using whatever the dialect has for that.
+    """
+    values = {'user_id': user_id, 'post_id': post_id, 'vote_type': vote_type}
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        # INSERT IGNORE rather than ON DUPLICATE KEY UPDATE: pymysql reports "found" rows,
+        # so a no-op update would look the same as an insert
+        stmt = mysql_insert(Vote.__table__).values(**values).prefix_with('IGNORE')
+    elif dialect == 'sqlite':
+        stmt = sqlite_insert(Vote.__table__).values(**values).on_conflict_do_nothing(
+            index_elements=['user_id', 'post_id']
+        )
+    elif dialect == 'postgresql':
+        stmt = postgresql_insert(Vote.__table__).values(**values).on_conflict_do_nothing(
+            index_elements=['user_id', 'post_id']
+        )
+    else:
+        # no upsert, at least don't insert when a row is already there
+        exists = db.session.query(Vote.id).filter_by(user_id=user_id, post_id=post_id).first()
+        if exists:
+            return False
+        stmt = Vote.__table__.insert().values(**values)
+    return db.session.execute(stmt).rowcount == 1
+
+def write_vote(user_id, post_id, vote_type):
+    """Apply one vote click and return (old_vote, new_vote) as it actually happened.
+
+    Clicking the same type again removes the vote, the other type switches it.
+    Every step is a single conditional statement and we go by the rows each one
+    touched, never by a value read earlier, so concurrent clicks each get a
+    consistent answer and the counters follow exactly what changed in the
+    table. Nothing is committed here.
+    """
+    # no vote yet - the common case is just this one statement
+    if insert_vote_if_missing(user_id, post_id, vote_type):
+        return None, vote_type
+    
+    vote = Vote.__table__
+    mine = (vote.c.user_id == user_id) & (vote.c.post_id == post_id)
+    
+    # same type again - toggle it off
+    removed = db.session.execute(vote.delete().where(mine & (vote.c.vote_type == vote_type)))
+    if removed.rowcount == 1:
+        return vote_type, None
+    
+    # the other type - switch it
+    other = 'down' if vote_type == 'up' else 'up'
+    switched = db.session.execute(
+        vote.update().where(mine & (vote.c.vote_type == other)).values(vote_type=vote_type)
+    )
+    if switched.rowcount == 1:
+        return other, vote_type
+    
+    # the row changed under us between statements (another click won), nothing to do
+    current = get_user_votes(user_id, [post_id]).get(post_id)
+    return current, current
+
 @votes_bp.route('', methods=['POST'])
 @login_required
+@rate_limit('vote')
 def vote_post():
     try:
         data = request.get_json()
@@ -26,50 +130,108 @@ def vote_post():
         
         user_id = session['user_id']
         
-        # Check if user already voted on this post
-        existing_vote = Vote.query.filter_by(user_id=user_id, post_id=post_id).first()
-        
-        if existing_vote:
-            if existing_vote.vote_type == vote_type:
-                # Same vote type - remove the vote (toggle off)
-                db.session.delete(existing_vote)
-                message = f'{vote_type.capitalize()}vote removed'
-            else:
-                # Different vote type - update the vote
-                existing_vote.vote_type = vote_type
-                message = f'Vote changed to {vote_type}vote'
-        else:
-            # No existing vote - create new vote
-            new_vote = Vote(
-                user_id=user_id,
-                post_id=post_id,
-                vote_type=vote_type
-            )
-            db.session.add(new_vote)
-            message = f'{vote_type.capitalize()}voted successfully'
-        
-        # Update post vote score
-        post.update_vote_score()
+        # Write the vote without reading it first, so two clicks at once can't
+        # both see "no vote" and crash into the unique constraint
+        old_vote, user_vote = write_vote(user_id, post.id, vote_type)
         
-        # Get updated vote info
-        user_vote = None
-        updated_vote = Vote.query.filter_by(user_id=user_id, post_id=post_id).first()
-        if updated_vote:
-            user_vote = updated_vote.vote_type
+        if old_vote == user_vote:
+            # a request racing this one already made the same change
+            message = 'Vote unchanged'
+        elif user_vote is None:
+            message = f'{vote_type.capitalize()}vote removed'
+        elif old_vote is None:
+            message = f'{vote_type.capitalize()}voted successfully'
+        else:
+            message = f'Vote changed to {vote_type}vote'
         
-        return jsonify({
-            'message': message,
-            'post': {
+        if vote_buffer.enabled:
+            # write-behind mode: commit just the vote, the counters catch up on the next flush
+            post_id, stored = post.id, (post.vote_score, post.upvotes, post.downvotes)
+            db.session.commit()
+            if old_vote != user_vote:
+                vote_buffer.add(post_id, old_vote, user_vote)
+            # show the counts including votes that haven't been flushed yet
+            up, down = vote_buffer.pending_delta(post_id)
+            result = {
+                'id': post_id,
+                'vote_score': stored[0] + up - down,
+                'upvotes': stored[1] + up,
+                'downvotes': stored[2] + down,
+                'user_vote': user_vote
+            }
+        else:
+            # Update the post's counters and commit them with the vote in one transaction
+            if old_vote != user_vote:
+                post.apply_vote(old_vote, user_vote)
+            # read the new counts before commit expires them, so there's no reload after
+            result = {
                 'id': post.id,
                 'vote_score': post.vote_score,
+                'upvotes': post.upvotes,
+                'downvotes': post.downvotes,
                 'user_vote': user_vote
             }
+            db.session.commit()
+            response_cache.invalidate_post(result['id'])
+        
+        return jsonify({
+            'message': message,
+            'post': result
         }), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to process vote'}), 500
 
+def parse_post_ids(value):
+    """Turn "1,2,3" or [1, 2, 3] into a de-duplicated list of ints (ValueError if bad)."""
+    if isinstance(value, str):
+        value = [part for part in value.split(',') if part.strip()]
+    if not isinstance(value, list):
+        raise ValueError('post_ids must be a list of post ids')
+    
+    post_ids = []
+    for post_id in value:
+        if isinstance(post_id, bool):
+            raise ValueError('post_ids must be a list of post ids')
+        post_id = int(post_id)
+        if post_id not in post_ids:
+            post_ids.append(post_id)
+    return post_ids
+
+@votes_bp.route('/mine', methods=['GET', 'POST'])
+@login_required
+def get_my_votes():
+    """The session user's votes on a batch of posts.
+
+    GET /api/votes/mine?post_ids=1,2,3 or POST {"post_ids": [...]} for long lists.
+    Every requested id comes back, with null where the user hasn't voted, so the
+    frontend can lay these over a cached (anonymous) feed.
+    """
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            raw_ids = data.get('post_ids', [])
+        else:
+            raw_ids = request.args.get('post_ids', '')
+        
+        try:
+            post_ids = parse_post_ids(raw_ids)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'post_ids must be a list of post ids'}), 400
+        
+        if len(post_ids) > MAX_VOTE_LOOKUP:
+            return jsonify({'error': f'At most {MAX_VOTE_LOOKUP} post ids per request'}), 400
+        
+        # one IN query on the (user_id, post_id) unique index
+        votes = get_user_votes(session['user_id'], post_ids)
+        return jsonify({
+            'votes': {str(post_id): votes.get(post_id) for post_id in post_ids}
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch votes'}), 500
+
 @votes_bp.route('/post/<int:post_id>', methods=['GET'])
 def get_post_votes(post_id):
     try:
@@ -78,26 +240,22 @@ def get_post_votes(post_id):
         if not post:
             return jsonify({'error': 'Post not found'}), 404
         
-        # Get vote counts
-        upvotes = Vote.query.filter_by(post_id=post_id, vote_type='up').count()
-        downvotes = Vote.query.filter_by(post_id=post_id, vote_type='down').count()
-        
         # Get user's vote if logged in
-        user_vote = None
-        if 'user_id' in session:
-            vote = Vote.query.filter_by(
-                user_id=session['user_id'], 
-                post_id=post_id
-            ).first()
-            user_vote = vote.vote_type if vote else None
+        user_vote = get_user_votes(session.get('user_id'), [post_id]).get(post_id)
         
-        return jsonify({
+        # every vote bumps the post revision, which covers the counts. user_vote goes in
+        # too since with the vote buffer on the revision only moves when it flushes
+        etag = make_etag('votes', post.id, post.revision, user_vote)
+        if not_modified(etag, post.activity_at):
+            return not_modified_response(etag, post.activity_at)
+        
+        return with_validators(jsonify({
             'post_id': post_id,
             'vote_score': post.vote_score,
-            'upvotes': upvotes,
-            'downvotes': downvotes,
+            'upvotes': post.upvotes,
+            'downvotes': post.downvotes,
             'user_vote': user_vote
-        }), 200
+        }), etag, post.activity_at), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch vote information'}), 500
\ No newline at end of file
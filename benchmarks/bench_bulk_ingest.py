@@ -0,0 +1,75 @@
+"""
+Benchmark: importing posts one ORM add+commit at a time (what a loop over
+POST /api/posts amounts to) vs ingest_posts() with multi-row INSERTs per chunk
+
+    python3 benchmarks/bench_bulk_ingest.py [number_of_posts]
+
+Uses an SQLite database in a temp file so commits actually hit the disk.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from backend.models import db, User, Post
+from backend.posts import ingest_posts
+from backend.search import index_post
+from backend.tags import set_post_tags
+
+
+def make_app(path):
+    return create_app(database_uri=f'sqlite:///{path}')
+
+
+def make_rows(count):
+    return [{
+        'title': f'Software Engineering Intern {i}',
+        'description': 'Work on backend services with the platform team. ' * 4,
+        'company': f'Company {i % 50}',
+        'link': f'https://example.com/jobs/{i}',
+        'tags': 'python, backend, remote'
+    } for i in range(count)]
+
+
+def one_at_a_time(rows, author_id):
+    for row in rows:
+        post = Post(title=row['title'], description=row['description'], company=row['company'],
+                    link=row['link'], tags=row['tags'], author_id=author_id, status='active', approved=True)
+        db.session.add(post)
+        db.session.flush()
+        index_post(post)
+        set_post_tags(post, row['tags'])
+        db.session.commit()
+
+
+def bulk(rows, author_id):
+    result = ingest_posts(rows, author_id)
+    assert not result['errors'], result['errors'][:3]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rows = make_rows(count)
+
+    for name, run in (('one commit per post', one_at_a_time), ('ingest_posts', bulk)):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = make_app(os.path.join(tmp, 'bench.db'))
+            with app.app_context():
+                db.create_all()
+                author = User(username='bench', email='bench@example.com', password_hash='x')
+                db.session.add(author)
+                db.session.commit()
+
+                start = time.perf_counter()
+                run([dict(row) for row in rows], author.id)
+                elapsed = time.perf_counter() - start
+                assert db.session.query(Post).count() == count
+                print(f"{name:>20}: {elapsed:7.2f} s  ({count / elapsed:8.0f} posts/s)")
+                db.session.remove()
+                db.engine.dispose()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: a login burst with bcrypt on the request threads vs on the bounded
+hashing pool (backend/passwords.py)
+
+    python3 benchmarks/bench_login.py [login_threads] [seconds]
+
+Login threads hammer POST /api/auth/login while one more thread keeps calling
+GET /api/auth/me, standing in for the rest of the site. Reports login
+throughput, how many logins got a 503, and the latency of the cheap endpoint.
+Uses BCRYPT_LOG_ROUNDS=10 and a temp SQLite file.
+"""
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from backend.models import db, User
+from backend.passwords import password_hasher
+
+PASSWORD = 'Secret123!'
+
+
+def make_app(path, workers):
+    return create_app({
+        'SECRET_KEY': 'bench',
+        'SQLITE_BUSY_TIMEOUT_MS': 60000,
+        'BCRYPT_LOG_ROUNDS': 10,
+        'BCRYPT_WORKERS': workers,
+        'BCRYPT_MAX_QUEUE': max(workers * 4, 1),
+        # the login limit would cut the storm off after 10 requests
+        'RATELIMIT_ENABLED': False,
+    }, database_uri=f'sqlite:///{path}')
+
+
+def run(app, login_threads, seconds):
+    stop = time.perf_counter() + seconds
+    logins, busy, me_times = [], [], []
+
+    def login_loop():
+        client = app.test_client()
+        while time.perf_counter() < stop:
+            status = client.post('/api/auth/login', json={'username': 'bench', 'password': PASSWORD}).status_code
+            (logins if status == 200 else busy).append(status)
+            if status == 503:
+                time.sleep(0.25)  # clients back off (Retry-After) instead of retrying right away
+
+    def other_traffic():
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = 1
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            client.get('/api/auth/me')
+            me_times.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(login_threads)]
+    threads.append(threading.Thread(target=other_traffic))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(logins) / seconds, len(busy), me_times
+
+
+def main():
+    login_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    workers = min(4, os.cpu_count() or 1)
+
+    for name, pool_size in (('request threads', 0), (f'pool of {workers}', workers)):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = make_app(os.path.join(tmp, 'bench.db'), pool_size)
+            with app.app_context():
+                db.create_all()
+                db.session.add(User(username='bench', email='bench@example.com',
+                                    password_hash=password_hasher.hash(PASSWORD)))
+                db.session.commit()
+                db.session.remove()
+
+            with contextlib.redirect_stdout(io.StringIO()):  # login prints a debug line each time
+                rate, rejected, me_times = run(app, login_threads, seconds)
+            me_times.sort()
+            p95 = me_times[int(len(me_times) * 0.95) - 1] if me_times else 0
+            print(f"{name:>16}: {rate:6.1f} logins/s, {rejected:4d} busy (503), "
+                  f"/me median {statistics.median(me_times):7.1f} ms p95 {p95:7.1f} ms")
+            with app.app_context():
+                db.engine.dispose()
+
+if __name__ == '__main__':
+    main()
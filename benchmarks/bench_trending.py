@@ -0,0 +1,96 @@
+"""
+Benchmark: sort=trending from the stored, indexed post.hot_score vs working
+the same decay formula out in SQL on every request
+
+    python3 benchmarks/bench_trending.py [number_of_posts]
+
+Uses an in-memory SQLite database so it runs anywhere.
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from sqlalchemy import func, desc, case
+from backend.models import db, User, Post, hot_score, TRENDING_EPOCH, TRENDING_WINDOW
+
+PAGE_SIZE = 20
+RUNS = 50
+
+
+def make_app():
+    return create_app(database_uri='sqlite:///:memory:')
+
+
+def add_posts(count):
+    author = User(username='bench', email='bench@example.com', password_hash='x')
+    db.session.add(author)
+    db.session.commit()
+
+    now = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        created_at = now - timedelta(seconds=random.randint(0, 180 * 24 * 3600))
+        vote_score = int(random.paretovariate(1.2)) - 1 - random.randint(0, 2)
+        rows.append({
+            'title': f'Internship {i}', 'description': 'x' * 200, 'link': 'https://example.com',
+            'author_id': author.id, 'status': 'active', 'approved': True,
+            'vote_score': vote_score, 'created_at': created_at, 'updated_at': created_at,
+            'hot_score': hot_score(vote_score, created_at), 'revision': 0, 'comment_count': 0
+        })
+    db.session.execute(db.insert(Post), rows)
+    db.session.commit()
+
+
+def stored_query():
+    return db.session.query(Post.id).filter_by(status='active', approved=True).order_by(
+        desc(Post.hot_score), desc(Post.created_at), desc(Post.id)
+    ).limit(PAGE_SIZE)
+
+
+def computed_query():
+    # same formula as hot_score() in models.py, but worked out per row per request
+    sign = case((Post.vote_score > 0, 1), (Post.vote_score < 0, -1), else_=0)
+    order = func.log10(func.max(func.abs(Post.vote_score), 1))
+    age = func.strftime('%s', Post.created_at) - func.strftime('%s', TRENDING_EPOCH.isoformat(' '))
+    score = sign * order + age / float(TRENDING_WINDOW)
+    return db.session.query(Post.id).filter_by(status='active', approved=True).order_by(
+        desc(score), desc(Post.created_at), desc(Post.id)
+    ).limit(PAGE_SIZE)
+
+
+def time_query(make_query):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        ids = [row.id for row in make_query().all()]
+    return (time.perf_counter() - start) / RUNS * 1000, ids
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        print(f"Adding {count} posts...")
+        add_posts(count)
+
+        for name, make_query in (('stored hot_score', stored_query), ('computed in SQL', computed_query)):
+            plan = db.session.execute(db.text(
+                'EXPLAIN QUERY PLAN ' + str(make_query().statement.compile(
+                    dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+            )).fetchall()
+            ms, ids = time_query(make_query)
+            print(f"{name:>18}: {ms:8.3f} ms per page")
+            for row in plan:
+                print(f"{'':>20}plan: {row[-1]}")
+            if name == 'stored hot_score':
+                stored_ids = ids
+            elif ids != stored_ids:
+                print("  (pages differ - check the formulas match)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import sys
+from pathlib import Path
+import pytest
+from sqlalchemy import event
+
+repo_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(repo_root))
+
+from app import create_app
+from backend.models import db, User, Post
+from backend.search import index_post
+
+
+def make_app(database_uri='sqlite:///:memory:', **config):
+    # the real app against a test database
+    return create_app(dict({
+        'SECRET_KEY': 'test',
+        'TESTING': True,
+        'BCRYPT_LOG_ROUNDS': 4,
+        # tests change rows directly, so the cache is off unless a test turns it on
+        'CACHE_ENABLED': False,
+    }, **config), database_uri=database_uri)
+
+
+@pytest.fixture
+def app():
+    _app = make_app()
+    with _app.app_context():
+        db.create_all()
+        yield _app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count_queries(app):
+    """Returns a list that collects every SQL statement run while the test is going."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def make_user(username, role='user'):
+    user = User(
+        username=username,
+        email=f'{username}@example.com',
+        password_hash='not-a-real-hash',
+        role=role
+    )
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_post(author, title='Software Engineering Intern', **kwargs):
+    fields = {
+        'description': 'A long enough description for an internship post.',
+        'link': 'https://example.com/jobs',
+        'status': 'active',
+        'approved': True,
+    }
+    fields.update(kwargs)
+    post = Post(title=title, author_id=author.id, **fields)
+    db.session.add(post)
+    db.session.flush()
+    index_post(post)
+    db.session.commit()
+    return post
+
+
+def login(client, user):
+    # skip bcrypt and just put the user in the session
+    with client.session_transaction() as sess:
+        sess['user_id'] = user.id
+        sess['username'] = user.username
+        sess['role'] = user.role
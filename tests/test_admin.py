@@ -0,0 +1,247 @@
+from backend.models import db, Report
+from conftest import make_user, make_post, login
+
+
+def report(post, *reporters, status='pending'):
+    for reporter in reporters:
+        db.session.add(Report(reporter_id=reporter.id, post_id=post.id, reason='spam', status=status))
+    # what create_report keeps up to date
+    if status == 'pending':
+        post.pending_report_count += len(reporters)
+    db.session.commit()
+
+
+def test_admin_posts_constant_queries(app, client, count_queries):
+    admin = make_user('admin', role='admin')
+    reporters = [make_user(f'reporter{i}') for i in range(3)]
+    posts = {}
+    for i in range(12):
+        author = make_user(f'author{i}')
+        posts[i] = make_post(author, title=f'Internship number {i}')
+    report(posts[3], *reporters)
+    report(posts[7], reporters[0])
+    report(posts[5], *reporters, status='resolved')
+    login(client, admin)
+    db.session.expire_all()
+
+    count_queries.clear()
+    data = client.get('/api/admin/posts?per_page=50').get_json()
+    # admin user, total count, the page with authors and report counts
+    assert len(count_queries) == 3
+    assert len(data['posts']) == 12
+    counts = {post['title']: post['report_count'] for post in data['posts']}
+    assert counts['Internship number 3'] == 3
+    assert counts['Internship number 7'] == 1
+    assert counts['Internship number 5'] == 0
+
+    data = client.get('/api/admin/posts?sort=reports&min_reports=1').get_json()
+    assert [(post['title'], post['report_count']) for post in data['posts']] == [
+        ('Internship number 3', 3), ('Internship number 7', 1)
+    ]
+    assert data['pagination']['total'] == 2
+
+    assert client.get('/api/admin/posts?sort=nope').status_code == 400
+    assert client.get('/api/admin/posts?per_page=1000').get_json()['pagination']['per_page'] == 100
+
+
+def test_report_queue_constant_queries(app, client, count_queries):
+    from datetime import datetime
+    admin = make_user('admin', role='admin')
+    for i in range(8):
+        post = make_post(make_user(f'author{i}'), title=f'Internship number {i}')
+        report(post, make_user(f'reporter{i}'))
+    reviewed = Report.query.first()
+    reviewed.status, reviewed.reviewed_by, reviewed.reviewed_at = 'resolved', admin.id, datetime.utcnow()
+    db.session.commit()
+    login(client, admin)
+    db.session.expire_all()
+
+    count_queries.clear()
+    data = client.get('/api/reports?status=all&per_page=50').get_json()
+    # admin user, total count, the page with posts/authors/reporters/reviewers joined in
+    assert len(count_queries) == 3
+    assert len(data['reports']) == 8
+    assert [r['reviewed_by']['username'] for r in data['reports'] if r['reviewed_by']] == ['admin']
+    assert all(r['post']['author']['username'].startswith('author') for r in data['reports'])
+
+    assert client.get('/api/reports').get_json()['pagination']['total'] == 7
+    assert client.get('/api/reports?status=bogus').status_code == 400
+    assert client.get('/api/reports?per_page=0').get_json()['pagination']['per_page'] == 1
+
+
+def test_user_list_stats_constant_queries(app, client, count_queries):
+    from backend.models import Comment, Vote
+    admin = make_user('admin', role='admin')
+    spammer = make_user('spam_bot')
+    users = [make_user(f'student{i}') for i in range(10)]
+    spam = [make_post(spammer, title=f'Buy now {i}') for i in range(3)]
+    make_post(users[0])
+    report(spam[0], *users[:4])
+    report(spam[1], users[0], status='dismissed')
+    for user in users[:5]:
+        db.session.add(Comment(content='nice', post_id=spam[2].id, author_id=user.id))
+        db.session.add(Vote(user_id=user.id, post_id=spam[2].id, vote_type='down'))
+    db.session.commit()
+    login(client, admin)
+    db.session.expire_all()
+
+    count_queries.clear()
+    data = client.get('/api/admin/users?per_page=50').get_json()
+    # admin user, total count, the page with every stat joined in
+    assert len(count_queries) == 3
+    assert len(data['users']) == 12
+    by_name = {user['username']: user for user in data['users']}
+    assert by_name['spam_bot']['post_count'] == 3
+    assert by_name['spam_bot']['reports_received'] == 4
+    assert by_name['student0']['reports_made'] == 2
+    assert by_name['student0']['comment_count'] == 1
+    assert by_name['student0']['vote_count'] == 1
+    assert by_name['student9']['post_count'] == 0
+
+    data = client.get('/api/admin/users?sort=reports_received&per_page=1').get_json()
+    assert data['users'][0]['username'] == 'spam_bot'
+
+    # prefix search on username or email, % and _ are literal
+    data = client.get('/api/admin/users?q=spam_').get_json()
+    assert [user['username'] for user in data['users']] == ['spam_bot']
+    assert client.get('/api/admin/users?q=spam%25').get_json()['users'] == []
+    assert client.get('/api/admin/users?q=STUDENT1@').get_json()['pagination']['total'] == 1
+
+    assert client.get('/api/admin/users?sort=nope').status_code == 400
+    assert client.get('/api/admin/users?per_page=1000').get_json()['pagination']['per_page'] == 100
+
+
+def test_bulk_post_action_per_id_outcomes(app, client, count_queries):
+    from backend.models import Post
+    admin = make_user('admin', role='admin')
+    author = make_user('spam_bot')
+    posts = [make_post(author, title=f'Spam offer {i}') for i in range(20)]
+    make_post(author, title='Old offer', status='expired')
+    login(client, admin)
+    ids = [post.id for post in posts]
+    db.session.expire_all()
+
+    count_queries.clear()
+    response = client.post('/api/admin/posts/bulk', json={'action': 'delete', 'post_ids': ids + [ids[0], 999]})
+    assert response.status_code == 200
+    data = response.get_json()
+    # admin user, lock the posts, one UPDATE, one search index delete - no matter how many posts
+    assert len(count_queries) == 4
+    assert data['updated'] == 20
+    assert data['posts'][-1] == {'id': 999, 'outcome': 'not_found'}
+    assert len(data['posts']) == 21
+    assert Post.query.filter_by(status='deleted').count() == 20
+    assert client.get('/api/posts?search=spam').get_json()['posts'] == []
+
+    data = client.post('/api/admin/posts/bulk', json={'action': 'restore', 'post_ids': ids[:2]}).get_json()
+    assert [post['outcome'] for post in data['posts']] == ['updated', 'updated']
+    assert len(client.get('/api/posts?search=spam').get_json()['posts']) == 2
+    data = client.post('/api/admin/posts/bulk', json={'action': 'restore', 'post_ids': ids[:1]}).get_json()
+    assert data['posts'] == [{'id': ids[0], 'outcome': 'unchanged'}]
+
+    assert client.post('/api/admin/posts/bulk', json={'action': 'nuke', 'post_ids': ids}).status_code == 400
+    assert client.post('/api/admin/posts/bulk', json={'action': 'delete', 'post_ids': 'all'}).status_code == 400
+    assert client.post('/api/admin/posts/bulk', json={'action': 'delete', 'post_ids': []}).status_code == 400
+    response = client.post('/api/admin/posts/bulk', json={'action': 'delete', 'post_ids': [ids[0], 'abc']})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'post_ids must be a non-empty list of ids'}
+
+
+def test_bulk_resolve_reports_by_post(app, client):
+    from backend.models import Post
+    admin = make_user('admin', role='admin')
+    spam = make_post(make_user('spam_bot'), title='Buy now')
+    other = make_post(make_user('student'), title='Real internship')
+    reporters = [make_user(f'reporter{i}') for i in range(5)]
+    report(spam, *reporters)
+    report(other, reporters[0])
+    login(client, admin)
+
+    data = client.post('/api/reports/bulk-resolve', json={'post_id': spam.id, 'action': 'delete_post'}).get_json()
+    assert data['resolved'] == 5
+    assert data['posts'] == [{'id': spam.id, 'outcome': 'updated'}]
+    assert db.session.get(Post, spam.id).status == 'deleted'
+    assert Report.query.filter_by(status='pending').count() == 1
+    assert {r.reviewed_by for r in Report.query.filter_by(post_id=spam.id)} == {admin.id}
+
+    # already reviewed reports don't act on their post again
+    ids = [r.id for r in Report.query.order_by(Report.id)]
+    data = client.post('/api/reports/bulk-resolve', json={'report_ids': ids + [999], 'action': 'dismiss'}).get_json()
+    assert [r['outcome'] for r in data['reports']] == ['already_reviewed'] * 5 + ['resolved', 'not_found']
+    assert data['posts'] == []
+    assert db.session.get(Post, other.id).status == 'active'
+
+    assert client.post('/api/reports/bulk-resolve', json={'report_ids': ids, 'post_id': spam.id}).status_code == 400
+    response = client.post('/api/reports/bulk-resolve', json={'report_ids': ['abc'], 'action': 'dismiss'})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'report_ids must be a non-empty list of ids'}
+
+
+def test_reports_quarantine_post_at_threshold(app, client):
+    from backend.models import Post
+    from backend.repair_counters import repair_report_counts
+    app.config['REPORT_QUARANTINE_THRESHOLD'] = 3
+    admin = make_user('admin', role='admin')
+    spam = make_post(make_user('spam_bot'), title='Buy now')
+    quiet = make_post(make_user('student'), title='Real internship')
+    reporters = [make_user(f'reporter{i}') for i in range(3)]
+
+    for i, reporter in enumerate(reporters):
+        login(client, reporter)
+        assert client.post('/api/reports', json={'post_id': spam.id, 'reason': 'spam spam'}).status_code == 201
+        assert db.session.get(Post, spam.id).approved == (i < 2)
+    client.post('/api/reports', json={'post_id': quiet.id, 'reason': 'wrong link'})
+    post = db.session.get(Post, spam.id)
+    assert post.pending_report_count == 3
+    # hidden from the feed
+    assert [p['title'] for p in client.get('/api/posts').get_json()['posts']] == ['Real internship']
+
+    # quarantined post is at the top of the queue, and of the admin list
+    login(client, admin)
+    queue = client.get('/api/reports').get_json()['reports']
+    assert [r['post']['id'] for r in queue] == [spam.id] * 3 + [quiet.id]
+    assert queue[0]['post']['approved'] is False
+    data = client.get('/api/admin/posts?sort=reports&min_reports=1').get_json()
+    assert [(p['title'], p['report_count']) for p in data['posts']] == [('Buy now', 3), ('Real internship', 1)]
+
+    # dismissing one report puts it back under the threshold and back in the feed
+    response = client.post(f'/api/reports/{queue[0]["id"]}/resolve', json={'action': 'dismiss'})
+    assert response.status_code == 200
+    post = db.session.get(Post, spam.id)
+    assert (post.pending_report_count, post.approved) == (2, True)
+    # resolving it again doesn't count twice
+    client.post(f'/api/reports/{queue[0]["id"]}/resolve', json={'action': 'dismiss'})
+    assert db.session.get(Post, spam.id).pending_report_count == 2
+
+    data = client.post('/api/reports/bulk-resolve', json={'post_id': spam.id, 'action': 'dismiss'}).get_json()
+    assert data['resolved'] == 2
+    assert db.session.get(Post, spam.id).pending_report_count == 0
+
+    # drift gets fixed by the repair job
+    db.session.get(Post, quiet.id).pending_report_count = 7
+    db.session.commit()
+    assert repair_report_counts() == {quiet.id: (7, 1)}
+
+
+def test_restore_releases_quarantined_post(app, client):
+    from backend.models import Post
+    app.config['REPORT_QUARANTINE_THRESHOLD'] = 2
+    admin = make_user('admin', role='admin')
+    spam = make_post(make_user('author'), title='Reported twice')
+    other = make_post(make_user('author2'), title='Also reported')
+    for i in range(2):
+        login(client, make_user(f'reporter{i}'))
+        client.post('/api/reports', json={'post_id': spam.id, 'reason': 'spam spam'})
+        client.post('/api/reports', json={'post_id': other.id, 'reason': 'spam spam'})
+    assert client.get('/api/posts').get_json()['posts'] == []
+
+    login(client, admin)
+    for post in (spam, other):
+        client.post('/api/reports/bulk-resolve', json={'post_id': post.id, 'action': 'delete_post'})
+
+    data = client.post(f'/api/admin/posts/{spam.id}/restore').get_json()
+    assert (data['post']['status'], data['post']['approved']) == ('active', True)
+    data = client.post('/api/admin/posts/bulk', json={'action': 'restore', 'post_ids': [other.id]}).get_json()
+    assert data['posts'] == [{'id': other.id, 'outcome': 'updated'}]
+    assert sorted(p['title'] for p in client.get('/api/posts').get_json()['posts']) == ['Also reported', 'Reported twice']
+    assert db.session.get(Post, spam.id).pending_report_count == 0
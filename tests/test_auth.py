@@ -0,0 +1,66 @@
+from backend.models import db, Comment
+from conftest import make_user, make_post, login
+
+
+def test_current_user_loaded_once_per_request(app, client, count_queries):
+    author = make_user('author')
+    post = make_post(author)
+    for i in range(10):
+        db.session.add(Comment(content=f'comment {i}', post_id=post.id, author_id=author.id))
+    db.session.commit()
+    url = f'/api/comments/post/{post.id}'
+
+    login(client, make_user('admin', role='admin'))
+    count_queries.clear()
+    data = client.get(url).get_json()
+    assert all(comment['can_edit'] for comment in data['comments'])
+    # post, the page of comments, and one lookup for the current user
+    assert len(count_queries) == 3
+    assert sum('FROM user' in sql for sql in count_queries) == 1
+
+
+def test_session_for_deleted_user(app, client):
+    user = make_user('gone')
+    login(client, user)
+    db.session.delete(user)
+    db.session.commit()
+
+    assert client.post('/api/votes', json={'post_id': 1, 'vote_type': 'up'}).status_code == 401
+    assert client.get('/api/auth/me').status_code == 401
+
+
+def signup(client, username='newuser', password='Secret123!'):
+    return client.post('/api/auth/signup', json={
+        'username': username, 'email': f'{username}@example.com', 'password': password
+    })
+
+
+def test_login_rehashes_old_cost(app, client):
+    from backend.models import User
+    from backend.passwords import password_hasher
+    assert signup(client).status_code == 201
+    user = User.query.filter_by(username='newuser').first()
+    assert user.password_hash.startswith('$2b$04$')
+    assert user.check_password('Secret123!') and not user.check_password('wrong')
+
+    # cost goes up - the next successful login upgrades the stored hash
+    app.config['BCRYPT_LOG_ROUNDS'] = 5
+    password_hasher.init_app(app)
+    assert client.post('/api/auth/login', json={'username': 'newuser', 'password': 'nope'}).status_code == 401
+    db.session.expire_all()
+    assert User.query.filter_by(username='newuser').first().password_hash.startswith('$2b$04$')
+
+    assert client.post('/api/auth/login', json={'username': 'newuser', 'password': 'Secret123!'}).status_code == 200
+    db.session.expire_all()
+    user = User.query.filter_by(username='newuser').first()
+    assert user.password_hash.startswith('$2b$05$')
+    assert user.check_password('Secret123!')
+
+
+def test_hashing_pool_full(app, client):
+    from backend.passwords import password_hasher
+    app.config['BCRYPT_MAX_QUEUE'] = 0
+    password_hasher.init_app(app)
+    response = signup(client)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
@@ -0,0 +1,60 @@
+from backend.models import db, Post
+from backend.posts import ingest_posts
+from conftest import make_user, login
+
+DESCRIPTION = 'A long enough description for an internship post.'
+
+
+def post_row(i, **fields):
+    row = {'title': f'Bulk internship {i}', 'description': DESCRIPTION,
+           'link': f'https://example.com/{i}', 'tags': 'Python, Remote'}
+    row.update(fields)
+    return row
+
+
+def test_ingest_posts_in_chunks(app, client):
+    admin = make_user('admin', role='admin')
+    rows = [post_row(i) for i in range(7)]
+    rows[3]['title'] = 'bad'
+
+    result = ingest_posts(rows, admin.id, chunk_size=2)
+    assert len(result['created']) == 6
+    assert result['errors'] == [{'row': 4, 'error': 'Title must be at least 5 characters'}]
+
+    titles = {post.id: post.title for post in Post.query.all()}
+    assert [titles[post_id] for post_id in result['created']] == [
+        f'Bulk internship {i}' for i in (0, 1, 2, 4, 5, 6)
+    ]
+    # each chunk found its ids by its own marker, not by author/id range
+    assert len({post.import_batch for post in Post.query.all()}) == 3
+
+    # new posts show up in search, tag filters and the feed
+    assert len(client.get('/api/posts?tags=python&per_page=50').get_json()['posts']) == 6
+    assert [post['title'] for post in client.get('/api/posts?search=internship 5').get_json()['posts']] == [
+        'Bulk internship 5'
+    ]
+
+
+def test_bulk_endpoint_json_and_csv(app, client):
+    admin = make_user('admin', role='admin')
+    login(client, admin)
+
+    response = client.post('/api/posts/bulk', json={'posts': [post_row(1), post_row(2, link='nope')]})
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['created'] == 1
+    assert data['errors'] == [{'row': 2, 'error': 'Link must be a valid URL'}]
+
+    csv_body = (
+        'title,description,link,company\n'
+        f'CSV internship one,{DESCRIPTION},https://example.com/a,Acme\n'
+        f'CSV internship two,{DESCRIPTION},https://example.com/b,\n'
+    )
+    response = client.post('/api/posts/bulk', data=csv_body, content_type='text/csv')
+    assert response.get_json()['created'] == 2
+    assert db.session.query(Post).filter_by(company='Acme').count() == 1
+
+
+def test_bulk_endpoint_is_admin_only(app, client):
+    login(client, make_user('someone'))
+    assert client.post('/api/posts/bulk', json=[post_row(1)]).status_code == 403
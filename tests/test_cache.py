@@ -0,0 +1,87 @@
+import pytest
+from backend.models import db
+from backend.cache import response_cache, LRUBackend
+from conftest import make_user, make_post, login
+
+
+@pytest.fixture
+def cache(app):
+    app.config['CACHE_ENABLED'] = True
+    response_cache.init_app(app)
+    return response_cache
+
+
+def test_lru_backend_evicts_oldest_and_expires():
+    backend = LRUBackend(max_entries=2)
+    backend.set('a', 1, ttl=60)
+    backend.set('b', 2, ttl=60)
+    backend.get('a')  # a is now the most recently used
+    backend.set('c', 3, ttl=60)
+    assert backend.get('b') is None
+    assert backend.get('a') == 1
+    assert backend.evictions == 1
+
+    backend.set('d', 4, ttl=-1)
+    assert backend.get('d') is None
+
+
+def test_feed_is_cached_until_a_write(app, client, cache, count_queries):
+    author = make_user('author')
+    make_post(author, title='First internship')
+
+    client.get('/api/posts')
+    count_queries.clear()
+    data = client.get('/api/posts').get_json()
+    assert [post['title'] for post in data['posts']] == ['First internship']
+    assert count_queries == []  # anonymous hit doesn't touch the db
+    assert cache.stats()['hits'] == 1
+
+    login(client, author)
+    client.post('/api/posts', json={
+        'title': 'Second internship',
+        'description': 'A long enough description for an internship post.',
+        'link': 'https://example.com/jobs'
+    })
+    titles = [post['title'] for post in client.get('/api/posts').get_json()['posts']]
+    assert titles == ['Second internship', 'First internship']
+
+
+def test_cached_bodies_get_per_user_fields(app, client, cache):
+    author = make_user('author')
+    voter = make_user('voter')
+    post = make_post(author)
+
+    # warm the cache as an anonymous user
+    assert client.get(f'/api/posts/{post.id}').get_json()['post']['can_edit'] is False
+
+    login(client, voter)
+    client.post('/api/votes', json={'post_id': post.id, 'vote_type': 'up'})
+    client.post('/api/comments', json={'post_id': post.id, 'content': 'hello'})
+
+    detail = client.get(f'/api/posts/{post.id}').get_json()
+    assert detail['post']['user_vote'] == 'up'
+    assert detail['post']['vote_score'] == 1
+    assert detail['post']['can_edit'] is False
+    assert detail['comments'][0]['can_edit'] is True
+
+    feed_post = client.get('/api/posts').get_json()['posts'][0]
+    assert feed_post['user_vote'] == 'up'
+    assert feed_post['comment_count'] == 1
+
+    login(client, author)
+    detail = client.get(f'/api/posts/{post.id}').get_json()
+    assert detail['post']['user_vote'] is None
+    assert detail['post']['can_edit'] is True
+    assert detail['comments'][0]['can_edit'] is False
+
+
+def test_admin_can_see_cache_stats(app, client, cache):
+    admin = make_user('admin', role='admin')
+    login(client, admin)
+    client.get('/api/posts')
+    client.get('/api/posts')
+
+    stats = client.get('/api/admin/cache').get_json()['cache']
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['entries'] == 1
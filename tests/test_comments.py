@@ -0,0 +1,154 @@
+import os
+import subprocess
+import sys
+from backend.models import db, Post, Comment, Vote
+from backend.repair_counters import repair_comment_counts, run_checks
+from conftest import make_app, make_user, make_post, login, repo_root
+
+
+def test_comment_count_follows_create_and_delete(app, client):
+    author = make_user('author')
+    post = make_post(author)
+    login(client, author)
+
+    first = client.post('/api/comments', json={'post_id': post.id, 'content': 'one'}).get_json()
+    client.post('/api/comments', json={'post_id': post.id, 'content': 'two'})
+    assert db.session.get(Post, post.id).comment_count == 2
+
+    client.delete(f"/api/comments/{first['comment']['id']}")
+    db.session.expire_all()
+    assert db.session.get(Post, post.id).comment_count == 1
+
+    data = client.get(f'/api/comments/post/{post.id}').get_json()
+    assert data['comment_count'] == 1
+    assert client.get(f'/api/posts/{post.id}').get_json()['post']['comment_count'] == 1
+
+
+def test_repair_comment_counts(app):
+    author = make_user('author')
+    good = make_post(author, title='Counted right')
+    drifted = make_post(author, title='Counted wrong', comment_count=5)
+    for post in (good, drifted):
+        db.session.add(Comment(content='hi', post_id=post.id, author_id=author.id))
+    good.comment_count = 1
+    db.session.commit()
+
+    fixed = repair_comment_counts(batch_size=1)
+    assert fixed == {drifted.id: (5, 1)}
+    db.session.expire_all()
+    assert db.session.get(Post, drifted.id).comment_count == 1
+    assert repair_comment_counts() == {}
+
+
+def test_find_and_delete_orphans(app):
+    author = make_user('author')
+    post = make_post(author)
+    db.session.add(Comment(content='fine', post_id=post.id, author_id=author.id))
+    db.session.add(Comment(content='lost post', post_id=9999, author_id=author.id))
+    db.session.add(Vote(user_id=8888, post_id=post.id, vote_type='up'))
+    db.session.commit()
+
+    report = run_checks(batch_size=1)
+    assert report['orphans'] == {'comment.post_id': [2], 'vote.user_id': [1]}
+    # the vote from the missing user still counts until it's deleted
+    assert report['vote_counts'] == {post.id: ((0, 0), (1, 0))}
+
+    report = run_checks(batch_size=1, fix_orphans=True)
+    assert report['orphans_deleted'] == 2
+    assert report['vote_counts'] == {post.id: ((1, 0), (0, 0))}
+    assert run_checks()['orphans'] == {}
+    assert db.session.query(Comment).count() == 1
+
+
+def test_missing_reviewer_is_cleared_not_deleted(app):
+    from datetime import datetime
+    from backend.models import Report
+    author, reporter = make_user('author'), make_user('reporter')
+    post = make_post(author)
+    db.session.add(Report(reporter_id=reporter.id, post_id=post.id, reason='spam spam',
+                          status='resolved', reviewed_by=7777, reviewed_at=datetime.utcnow()))
+    db.session.commit()
+
+    report = run_checks(fix_orphans=True)
+    assert report['orphans'] == {'report.reviewed_by': [1]}
+    assert report['orphans_deleted'] == 1
+    kept = db.session.query(Report).one()
+    assert (kept.status, kept.reviewed_by) == ('resolved', None)
+
+
+def test_comment_pages(app, client, count_queries):
+    from datetime import datetime
+    author = make_user('author')
+    post = make_post(author)
+    same_time = datetime(2026, 3, 1, 12, 0)
+    for i in range(5):
+        # ties on created_at still page in a stable order thanks to the id
+        db.session.add(Comment(content=f'comment {i}', post_id=post.id, author_id=author.id,
+                               created_at=same_time if i < 3 else datetime(2026, 3, 2, i)))
+    db.session.commit()
+
+    seen = []
+    cursor = ''
+    while cursor is not None:
+        url = f'/api/comments/post/{post.id}?per_page=2&cursor={cursor}'
+        count_queries.clear()
+        data = client.get(url).get_json()
+        # post, comments with authors - no per-comment author or user lookups
+        assert len(count_queries) == 2
+        seen += [comment['content'] for comment in data['comments']]
+        cursor = data['pagination']['next_cursor']
+    assert seen == [f'comment {i}' for i in range(5)]
+
+    assert client.get(f'/api/comments/post/{post.id}?cursor=nope').status_code == 400
+
+    # the post detail only embeds the first page
+    app.config['COMMENTS_PER_PAGE'] = 3
+    data = client.get(f'/api/posts/{post.id}').get_json()
+    assert [comment['content'] for comment in data['comments']] == ['comment 0', 'comment 1', 'comment 2']
+    assert data['comments_pagination']['has_next'] is True
+    rest = client.get(f"/api/comments/post/{post.id}?cursor={data['comments_pagination']['next_cursor']}").get_json()
+    assert [comment['content'] for comment in rest['comments']] == ['comment 3', 'comment 4']
+
+
+def test_repair_keeps_changes_made_while_it_runs(app, monkeypatch):
+    import backend.repair_counters as repair
+    author = make_user('author')
+    post = make_post(author, comment_count=5)
+    db.session.add(Comment(content='hi', post_id=post.id, author_id=author.id))
+    db.session.commit()
+
+    counted = repair.get_comment_counts
+
+    def count_then_comment(post_ids):
+        counts = counted(post_ids)
+        # someone comments after the job counted, the way comments.py does it
+        db.session.add(Comment(content='late', post_id=post.id, author_id=author.id))
+        db.session.query(Post).filter(Post.id == post.id).update({'comment_count': Post.comment_count + 1})
+        return counts
+
+    monkeypatch.setattr(repair, 'get_comment_counts', count_then_comment)
+    assert repair.repair_comment_counts() == {post.id: (5, 1)}
+    db.session.expire_all()
+    assert db.session.get(Post, post.id).comment_count == 2
+
+
+def test_repair_cli_runs_as_documented(tmp_path):
+    database_uri = f'sqlite:///{tmp_path / "hub.db"}'
+    file_app = make_app(database_uri)
+    with file_app.app_context():
+        db.create_all()
+        post = make_post(make_user('author'), comment_count=3)
+        post_id = post.id
+        db.session.remove()
+
+    # `python3 backend/repair_counters.py` from the repo root, like cron would
+    result = subprocess.run(
+        [sys.executable, 'backend/repair_counters.py', '--batch-size', '10'],
+        cwd=repo_root, env=dict(os.environ, DATABASE_URL=database_uri),
+        capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    assert f'post {post_id}: 3 -> 0' in result.stdout
+    with file_app.app_context():
+        assert db.session.get(Post, post_id).comment_count == 0
+        db.session.remove()
@@ -0,0 +1,101 @@
+from conftest import make_user, make_post, login
+
+
+def revalidate(client, url, response):
+    return client.get(url, headers={'If-None-Match': response.headers['ETag']})
+
+
+def test_unchanged_responses_get_304(app, client):
+    author = make_user('author')
+    post = make_post(author)
+
+    for url in ('/api/posts', f'/api/posts/{post.id}',
+                f'/api/comments/post/{post.id}', f'/api/votes/post/{post.id}'):
+        first = client.get(url)
+        assert first.status_code == 200
+        assert first.headers['ETag']
+        assert first.headers['Last-Modified']
+
+        second = revalidate(client, url, first)
+        assert second.status_code == 304
+        assert second.data == b''
+        assert second.headers['ETag'] == first.headers['ETag']
+
+
+def test_304_skips_loading_the_body(app, client, count_queries):
+    author = make_user('author')
+    post = make_post(author)
+    url = f'/api/posts/{post.id}'
+    first = client.get(url)
+
+    count_queries.clear()
+    assert revalidate(client, url, first).status_code == 304
+    # just the post row, no comments
+    assert len(count_queries) == 1
+
+
+def test_votes_and_comments_change_the_etag(app, client):
+    author = make_user('author')
+    voter = make_user('voter')
+    post = make_post(author)
+    login(client, voter)
+
+    urls = ['/api/posts', f'/api/posts/{post.id}',
+            f'/api/comments/post/{post.id}', f'/api/votes/post/{post.id}']
+    before = {url: client.get(url) for url in urls}
+
+    client.post('/api/votes', json={'post_id': post.id, 'vote_type': 'up'})
+    for url in urls:
+        assert revalidate(client, url, before[url]).status_code == 200
+
+    before = {url: client.get(url) for url in urls}
+    client.post('/api/comments', json={'post_id': post.id, 'content': 'hello'})
+    for url in urls:
+        assert revalidate(client, url, before[url]).status_code == 200
+
+
+def test_etag_depends_on_who_is_asking(app, client):
+    author = make_user('author')
+    post = make_post(author)
+    url = f'/api/posts/{post.id}'
+
+    anonymous = client.get(url)
+    login(client, author)
+    # can_edit is different for the author, so the anonymous copy isn't good
+    assert revalidate(client, url, anonymous).status_code == 200
+
+
+def test_if_modified_since(app, client):
+    author = make_user('author')
+    post = make_post(author)
+    url = f'/api/votes/post/{post.id}'
+
+    first = client.get(url)
+    response = client.get(url, headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert response.status_code == 304
+    response = client.get(url, headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'})
+    assert response.status_code == 200
+
+
+def test_votes_move_last_modified_not_updated_at(app, client):
+    from datetime import datetime, timedelta
+    from backend.models import db, Post
+    author = make_user('author')
+    post = make_post(author)
+    # pretend the post was written a while ago
+    earlier = datetime.utcnow() - timedelta(days=1)
+    db.session.query(Post).filter(Post.id == post.id).update({'updated_at': earlier, 'activity_at': earlier})
+    db.session.commit()
+    url = f'/api/posts/{post.id}'
+    before = client.get(url)
+
+    login(client, make_user('voter'))
+    client.post('/api/votes', json={'post_id': post.id, 'vote_type': 'up'})
+    client.post('/api/comments', json={'post_id': post.id, 'content': 'hello'})
+    after = client.get(url)
+
+    # updated_at is still the last edit, Last-Modified follows the activity
+    assert after.get_json()['post']['updated_at'] == before.get_json()['post']['updated_at']
+    assert after.headers['Last-Modified'] != before.headers['Last-Modified']
+    response = client.get(url, headers={'If-Modified-Since': before.headers['Last-Modified']})
+    assert response.status_code == 200
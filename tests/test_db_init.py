@@ -19,4 +19,25 @@ def test_db_create_all(app):
     with app.app_context():
         db.create_all()
         metadata = db.metadata
-        assert len(metadata.tables) > 0
\ No newline at end of file
+        assert len(metadata.tables) > 0
+
+def test_pool_settings_from_env(monkeypatch):
+    from backend.database import engine_options, config_from_env
+    monkeypatch.setenv('DB_POOL_SIZE', '3')
+    monkeypatch.setenv('DB_POOL_PRE_PING', '0')
+    monkeypatch.setenv('DB_STATEMENT_TIMEOUT_MS', '2000')
+    config = dict(config_from_env(), SQLALCHEMY_DATABASE_URI='mysql+pymysql://u:p@localhost/hub')
+    options = engine_options(config)
+    assert options['pool_size'] == 3
+    assert options['pool_pre_ping'] is False
+    assert options['max_overflow'] == 20
+    assert options['connect_args'] == {'init_command': 'SET SESSION max_execution_time = 2000'}
+    # sqlite has no pool to size
+    assert 'pool_size' not in engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+
+
+def test_sqlite_file_uses_wal(tmp_path):
+    file_app = create_app(database_uri=f'sqlite:///{tmp_path / "hub.db"}')
+    with file_app.app_context():
+        assert db.session.execute(db.text('PRAGMA journal_mode')).scalar() == 'wal'
+        db.session.remove()
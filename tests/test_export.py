@@ -0,0 +1,48 @@
+import csv
+import gzip
+import io
+import json
+from backend.models import db, Vote
+from conftest import make_user, make_post, login
+
+
+def test_export_requires_admin(app, client):
+    login(client, make_user('someone'))
+    assert client.get('/api/admin/export/posts').status_code == 403
+
+
+def test_export_posts_ndjson(app, client):
+    admin = make_user('admin', role='admin')
+    for i in range(5):
+        make_post(admin, title=f'Internship number {i}')
+    login(client, admin)
+
+    response = client.get('/api/admin/export/posts')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.data.decode().splitlines()]
+    assert [row['title'] for row in rows] == [f'Internship number {i}' for i in range(5)]
+    assert rows[0]['author_id'] == admin.id
+
+
+def test_export_votes_csv_gzip(app, client):
+    admin = make_user('admin', role='admin')
+    post = make_post(admin)
+    db.session.add(Vote(user_id=admin.id, post_id=post.id, vote_type='up'))
+    db.session.commit()
+    login(client, admin)
+
+    response = client.get('/api/admin/export/votes?format=csv&gzip=1')
+    assert response.mimetype == 'application/gzip'
+    assert 'votes.csv.gz' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.data).decode())))
+    assert rows == [{
+        'id': '1', 'user_id': str(admin.id), 'post_id': str(post.id),
+        'vote_type': 'up', 'created_at': rows[0]['created_at']
+    }]
+
+
+def test_export_bad_table_or_format(app, client):
+    login(client, make_user('admin', role='admin'))
+    assert client.get('/api/admin/export/users').status_code == 404
+    assert client.get('/api/admin/export/posts?format=xml').status_code == 400
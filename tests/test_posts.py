@@ -0,0 +1,159 @@
+from backend.models import db, Comment, Vote
+from conftest import make_user, make_post, login
+
+
+def add_posts(author, voter, count):
+    for i in range(count):
+        post = make_post(author, title=f'Internship number {i}', comment_count=1)
+        db.session.add(Comment(content='nice', post_id=post.id, author_id=voter.id))
+        db.session.add(Vote(user_id=voter.id, post_id=post.id, vote_type='up'))
+    db.session.commit()
+
+
+def feed_query_count(client, count_queries, per_page):
+    count_queries.clear()
+    response = client.get(f'/api/posts?per_page={per_page}')
+    assert response.status_code == 200
+    assert len(response.get_json()['posts']) == per_page
+    return len(count_queries)
+
+
+def test_feed_query_count_does_not_grow_with_page_size(app, client, count_queries):
+    author = make_user('author')
+    voter = make_user('voter')
+    add_posts(author, voter, 30)
+    login(client, voter)
+
+    small = feed_query_count(client, count_queries, 5)
+    large = feed_query_count(client, count_queries, 30)
+
+    # count + page (with authors joined) + newest updated_at + user votes
+    assert small == large == 4
+    assert not any('from comment' in statement.lower() for statement in count_queries)
+
+
+def test_feed_includes_counts_and_user_vote(app, client):
+    author = make_user('author')
+    voter = make_user('voter')
+    add_posts(author, voter, 2)
+    make_post(author, title='Quiet internship')
+    login(client, voter)
+
+    posts = client.get('/api/posts').get_json()['posts']
+    by_title = {post['title']: post for post in posts}
+
+    assert by_title['Internship number 0']['comment_count'] == 1
+    assert by_title['Internship number 0']['user_vote'] == 'up'
+    assert by_title['Internship number 0']['author']['username'] == 'author'
+    assert by_title['Quiet internship']['comment_count'] == 0
+    assert by_title['Quiet internship']['user_vote'] is None
+
+
+def walk_cursor_pages(client, sort, per_page):
+    titles = []
+    cursor = ''
+    while True:
+        response = client.get(f'/api/posts?sort={sort}&per_page={per_page}&cursor={cursor}')
+        assert response.status_code == 200
+        data = response.get_json()
+        titles.extend(post['title'] for post in data['posts'])
+        if not data['pagination']['has_next']:
+            return titles
+        cursor = data['pagination']['next_cursor']
+
+
+def test_cursor_pages_match_page_mode(app, client):
+    author = make_user('author')
+    voter = make_user('voter')
+    posts = [make_post(author, title=f'Internship number {i}') for i in range(7)]
+    # ties on vote_score so the created_at/id tie-breakers matter
+    for post in posts[::2]:
+        post.vote_score = 3
+    db.session.commit()
+
+    for sort in ('recent', 'popular'):
+        expected = [post['title'] for post in
+                    client.get(f'/api/posts?sort={sort}&per_page=50').get_json()['posts']]
+        assert walk_cursor_pages(client, sort, 3) == expected
+        assert len(set(expected)) == 7
+
+
+def test_cursor_mode_skips_count_query(app, client, count_queries):
+    author = make_user('author')
+    for i in range(5):
+        make_post(author, title=f'Internship number {i}')
+
+    count_queries.clear()
+    data = client.get('/api/posts?cursor=&per_page=2').get_json()
+    assert 'total' not in data['pagination']
+    # the grouped comment count is fine, the total-rows COUNT(*) is what we skip
+    assert not any('count(*)' in statement.lower() for statement in count_queries)
+
+
+def test_bad_cursor_is_rejected(app, client):
+    assert client.get('/api/posts?cursor=not-a-cursor').status_code == 400
+
+    author = make_user('author')
+    for i in range(3):
+        make_post(author, title=f'Internship number {i}')
+    cursor = client.get('/api/posts?cursor=&per_page=1').get_json()['pagination']['next_cursor']
+    # a cursor from one sort can't be used with another
+    assert client.get(f'/api/posts?sort=popular&cursor={cursor}').status_code == 400
+
+
+def test_tag_filter_matches_whole_tags(app, client):
+    author = make_user('author')
+    login(client, author)
+    for title, tags in (('Java Backend Intern', 'Java, Backend'),
+                        ('JavaScript Frontend Intern', 'JavaScript, Frontend'),
+                        ('Fullstack Intern', 'java, javascript')):
+        client.post('/api/posts', json={
+            'title': title,
+            'description': 'A long enough description for an internship post.',
+            'link': 'https://example.com/jobs',
+            'tags': tags
+        })
+
+    def titles(query):
+        return sorted(post['title'] for post in client.get(f'/api/posts?{query}').get_json()['posts'])
+
+    # "Java" no longer matches "JavaScript", and case doesn't matter
+    assert titles('tags=JAVA') == ['Fullstack Intern', 'Java Backend Intern']
+    assert titles('tags=java,javascript') == ['Fullstack Intern']
+    assert titles('tags=backend,frontend&tag_mode=any') == ['Java Backend Intern', 'JavaScript Frontend Intern']
+    assert titles('tags=java,nosuchtag') == []
+
+    # tags still come back as the list the author typed
+    post = client.get('/api/posts?tags=backend').get_json()['posts'][0]
+    assert post['tags'] == ['Java', ' Backend']
+
+    client.put(f"/api/posts/{post['id']}", json={'tags': 'Go'})
+    assert titles('tags=backend') == []
+    assert titles('tags=go') == ['Java Backend Intern']
+
+
+def test_long_tags_and_concurrent_tag_creation(app, client, monkeypatch):
+    import backend.tags as tags
+    from backend.models import Tag
+    login(client, make_user('author'))
+    # two tags that only differ after the 100 character column limit
+    response = client.post('/api/posts', json={
+        'title': 'Long tags intern',
+        'description': 'A long enough description for an internship post.',
+        'link': 'https://example.com/jobs',
+        'tags': 'x' * 100 + 'a, ' + 'x' * 100 + 'b'
+    })
+    assert response.status_code == 201
+    assert [tag.name for tag in Tag.query.all()] == ['x' * 100]
+
+    # another request creates the tag between our lookup and our insert
+    insert_missing_tags = tags.insert_missing_tags
+
+    def raced(names):
+        db.session.execute(Tag.__table__.insert(), [{'name': name} for name in names])
+        insert_missing_tags(names)
+
+    monkeypatch.setattr(tags, 'insert_missing_tags', raced)
+    found = tags.get_or_create_tags(['rust', 'x' * 100])
+    assert sorted(found) == ['rust', 'x' * 100]
+    assert Tag.query.filter_by(name='rust').count() == 1
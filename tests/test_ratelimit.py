@@ -0,0 +1,79 @@
+import time
+from backend.ratelimit import rate_limiter, MemoryBackend, SQLiteBackend, parse_limit
+from conftest import make_user, make_post, login
+
+
+def test_login_limited_per_ip(app, client):
+    for _ in range(10):
+        assert client.post('/api/auth/login', json={'username': 'x', 'password': 'y'}).status_code == 401
+    response = client.post('/api/auth/login', json={'username': 'x', 'password': 'y'})
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 6
+
+    # another address has its own bucket
+    other = client.post('/api/auth/login', json={'username': 'x', 'password': 'y'},
+                        environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other.status_code == 401
+
+
+def test_votes_limited_per_user(app, client):
+    app.config['RATELIMITS'] = {'vote': '3/minute'}
+    rate_limiter.init_app(app)
+    post = make_post(make_user('author'))
+    post_id = post.id
+
+    login(client, make_user('fast'))
+    statuses = [client.post('/api/votes', json={'post_id': post_id, 'vote_type': 'up'}).status_code
+                for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+
+    login(client, make_user('slow'))
+    assert client.post('/api/votes', json={'post_id': post_id, 'vote_type': 'up'}).status_code == 200
+
+
+def test_token_bucket_refills():
+    capacity, rate = parse_limit('2/second')
+    backend = MemoryBackend()
+    now = 1000.0
+    assert backend.take('k', capacity, rate, now) == 0
+    assert backend.take('k', capacity, rate, now) == 0
+    assert backend.take('k', capacity, rate, now) == 0.5
+    assert backend.take('k', capacity, rate, now + 0.5) == 0
+
+
+def test_memory_backend_drops_oldest_over_max_keys():
+    backend = MemoryBackend(max_keys=1000)
+    capacity, rate = parse_limit('1/hour')
+    # a burst of fresh keys, none old enough to count as stale
+    for i in range(5000):
+        backend.take(f'login:ip:{i}', capacity, rate, now=100.0)
+    assert len(backend.buckets) == 1000
+    assert 'login:ip:0' not in backend.buckets
+    # recently used keys survive, and are still limited
+    assert backend.take('login:ip:4999', capacity, rate, now=101.0) > 0
+
+    # stays cheap when every check is over the limit
+    start = time.perf_counter()
+    for i in range(5000, 15000):
+        backend.take(f'login:ip:{i}', capacity, rate, now=102.0)
+    assert (time.perf_counter() - start) / 10000 < 0.0005
+    assert len(backend.buckets) == 1000
+
+
+def test_sqlite_backend_is_shared(tmp_path):
+    # two workers pointing at the same file spend from the same bucket
+    path = str(tmp_path / 'limits.db')
+    worker1, worker2 = SQLiteBackend(path), SQLiteBackend(path)
+    capacity, rate = parse_limit('2/minute')
+    now = time.time()
+    assert worker1.take('login:ip:1.2.3.4', capacity, rate, now) == 0
+    assert worker2.take('login:ip:1.2.3.4', capacity, rate, now) == 0
+    assert worker1.take('login:ip:1.2.3.4', capacity, rate, now) > 0
+
+
+def test_check_is_cheap(app):
+    start = time.perf_counter()
+    for i in range(10000):
+        rate_limiter.check('vote', f'user:{i % 100}')
+    # generous bound - it's a few microseconds per check in practice
+    assert (time.perf_counter() - start) / 10000 < 0.0001
@@ -0,0 +1,66 @@
+from backend.models import db
+from backend.search import rebuild_search_index
+from conftest import make_user, make_post, login
+
+
+def search_titles(client, query):
+    response = client.get(f'/api/posts?{query}')
+    assert response.status_code == 200
+    return [post['title'] for post in response.get_json()['posts']]
+
+
+def test_multi_term_search_matches_all_terms(app, client):
+    author = make_user('author')
+    make_post(author, title='Backend Engineering Intern', company='Netflix')
+    make_post(author, title='Backend Intern', company='Stripe')
+    make_post(author, title='Frontend Engineering Intern', company='Netflix')
+
+    assert search_titles(client, 'search=backend netflix') == ['Backend Engineering Intern']
+    # prefix matching on each term
+    assert sorted(search_titles(client, 'search=engineer')) == [
+        'Backend Engineering Intern', 'Frontend Engineering Intern'
+    ]
+    assert search_titles(client, 'search=nothing-like-this') == []
+
+
+def test_relevance_sort_puts_best_match_first(app, client):
+    author = make_user('author')
+    make_post(author, title='Data Science Intern',
+              description='Python python python data pipelines and python notebooks.')
+    make_post(author, title='Marketing Intern',
+              description='Some python scripting might come up now and then.')
+
+    titles = search_titles(client, 'search=python&sort=relevance')
+    assert titles == ['Data Science Intern', 'Marketing Intern']
+    assert client.get('/api/posts?search=python&sort=relevance&cursor=').status_code == 400
+
+
+def test_index_follows_create_update_delete(app, client):
+    author = make_user('author')
+    login(client, author)
+
+    response = client.post('/api/posts', json={
+        'title': 'Quantum Computing Intern',
+        'description': 'Work on qubits with the research group this summer.',
+        'link': 'https://example.com/quantum'
+    })
+    post_id = response.get_json()['post']['id']
+    assert search_titles(client, 'search=qubits') == ['Quantum Computing Intern']
+
+    client.put(f'/api/posts/{post_id}', json={'description': 'Work on compilers with the research group.'})
+    assert search_titles(client, 'search=qubits') == []
+    assert search_titles(client, 'search=compilers') == ['Quantum Computing Intern']
+
+    client.delete(f'/api/posts/{post_id}')
+    assert search_titles(client, 'search=compilers') == []
+
+
+def test_rebuild_search_index(app, client):
+    author = make_user('author')
+    make_post(author, title='Security Intern')
+    db.session.execute(db.text('DELETE FROM post_fts'))
+    db.session.commit()
+    assert search_titles(client, 'search=security') == []
+
+    rebuild_search_index()
+    assert search_titles(client, 'search=security') == ['Security Intern']
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+from backend.models import db, Post, hot_score
+from backend.trending import recompute_hot_scores
+from conftest import make_user, make_post, login
+
+
+def test_hot_score_trades_votes_for_recency():
+    now = datetime(2026, 1, 1)
+    # 10x the votes is worth 12.5 hours
+    assert hot_score(100, now) > hot_score(10, now) > hot_score(0, now) > hot_score(-10, now)
+    assert hot_score(100, now - timedelta(hours=12)) > hot_score(10, now)
+    assert hot_score(100, now - timedelta(hours=13)) < hot_score(10, now)
+
+
+def test_trending_sort(app, client):
+    author = make_user('author')
+    now = datetime.utcnow()
+    make_post(author, title='Old and popular', vote_score=1000, created_at=now - timedelta(days=10))
+    make_post(author, title='New and liked', vote_score=10, created_at=now - timedelta(hours=1))
+    make_post(author, title='Brand new', vote_score=0, created_at=now)
+
+    titles = [post['title'] for post in client.get('/api/posts?sort=trending').get_json()['posts']]
+    assert titles == ['New and liked', 'Brand new', 'Old and popular']
+
+    cursor_titles = []
+    cursor = ''
+    while cursor is not None:
+        data = client.get(f'/api/posts?sort=trending&per_page=1&cursor={cursor}').get_json()
+        cursor_titles += [post['title'] for post in data['posts']]
+        cursor = data['pagination']['next_cursor']
+    assert cursor_titles == titles
+
+
+def test_votes_update_hot_score(app, client):
+    author = make_user('author')
+    post = make_post(author)
+    before = post.hot_score
+
+    # +-1 counts the same as 0 (log10(1) == 0), so it takes two votes to move
+    for name in ('voter1', 'voter2'):
+        login(client, make_user(name))
+        client.post('/api/votes', json={'post_id': post.id, 'vote_type': 'down'})
+    db.session.expire_all()
+    post = db.session.get(Post, post.id)
+    assert post.hot_score < before
+    assert post.hot_score == hot_score(-2, post.created_at)
+
+
+def test_recompute_hot_scores(app):
+    author = make_user('author')
+    good = make_post(author, title='Scored right')
+    drifted = make_post(author, title='Scored wrong')
+    drifted.hot_score = 0
+    db.session.commit()
+    updated_at = drifted.updated_at
+
+    assert recompute_hot_scores(batch_size=1) == 1
+    db.session.expire_all()
+    drifted = db.session.get(Post, drifted.id)
+    assert drifted.hot_score == hot_score(0, drifted.created_at)
+    assert drifted.updated_at == updated_at
+    assert recompute_hot_scores() == 0
@@ -0,0 +1,194 @@
+import time
+from backend.models import db, Post, Vote, hot_score
+from backend.repair_counters import repair_vote_counts
+from conftest import make_user, make_post, login
+
+
+def vote(client, post, vote_type):
+    return client.post('/api/votes', json={'post_id': post.id, 'vote_type': vote_type}).get_json()['post']
+
+
+def test_vote_counters_follow_votes(app, client):
+    author = make_user('author')
+    post = make_post(author)
+
+    login(client, make_user('voter1'))
+    assert vote(client, post, 'up') == {'id': post.id, 'vote_score': 1, 'upvotes': 1, 'downvotes': 0, 'user_vote': 'up'}
+    assert vote(client, post, 'down') == {'id': post.id, 'vote_score': -1, 'upvotes': 0, 'downvotes': 1, 'user_vote': 'down'}
+
+    login(client, make_user('voter2'))
+    assert vote(client, post, 'down')['vote_score'] == -2
+    assert vote(client, post, 'down') == {'id': post.id, 'vote_score': -1, 'upvotes': 0, 'downvotes': 1, 'user_vote': None}
+
+    data = client.get(f'/api/votes/post/{post.id}').get_json()
+    assert (data['upvotes'], data['downvotes'], data['user_vote']) == (0, 1, None)
+    assert repair_vote_counts() == {}
+
+
+def test_vote_does_not_recount(app, client, count_queries):
+    post = make_post(make_user('author'))
+    login(client, make_user('voter'))
+
+    count_queries.clear()
+    vote(client, post, 'up')
+    # no COUNT over the post's votes, just a relative UPDATE of the counters
+    assert not [sql for sql in count_queries if 'count(' in sql.lower()]
+    assert any('vote_score=(post.vote_score + ?)' in sql for sql in count_queries)
+    # and only the counters are read back, not the whole row again
+    update = next(i for i, sql in enumerate(count_queries) if 'vote_score=(post.vote_score + ?)' in sql)
+    assert not [sql for sql in count_queries[update:] if 'post.description' in sql]
+    assert len([sql for sql in count_queries[update:] if sql.startswith('UPDATE post')]) == 2
+
+
+def test_repair_vote_counts(app):
+    author = make_user('author')
+    post = make_post(author)
+    voters = [make_user(f'voter{i}') for i in range(3)]
+    for voter, vote_type in zip(voters, ('up', 'up', 'down')):
+        db.session.add(Vote(user_id=voter.id, post_id=post.id, vote_type=vote_type))
+    db.session.commit()
+
+    assert repair_vote_counts(batch_size=1) == {post.id: ((0, 0), (2, 1))}
+    db.session.expire_all()
+    post = db.session.get(Post, post.id)
+    assert (post.upvotes, post.downvotes, post.vote_score) == (2, 1, 1)
+    assert post.hot_score == hot_score(1, post.created_at)
+
+
+def test_vote_buffer(app, client):
+    from backend.vote_buffer import vote_buffer
+    app.config['VOTE_BUFFER_ENABLED'] = True
+    app.config['VOTE_BUFFER_FLUSH_MS'] = 60000  # only flushes when full or on shutdown
+    app.config['VOTE_BUFFER_MAX_EVENTS'] = 3
+    vote_buffer.init_app(app)
+    try:
+        post = make_post(make_user('author'))
+        post_id = post.id
+
+        login(client, make_user('voter1'))
+        assert vote(client, post, 'up') == {'id': post_id, 'vote_score': 1, 'upvotes': 1, 'downvotes': 0, 'user_vote': 'up'}
+        login(client, make_user('voter2'))
+        assert vote(client, post, 'down')['vote_score'] == 0
+
+        # vote rows are in, the post row hasn't been touched yet
+        db.session.expire_all()
+        assert db.session.query(Vote).count() == 2
+        assert (db.session.get(Post, post_id).upvotes, db.session.get(Post, post_id).downvotes) == (0, 0)
+
+        # the third vote fills the buffer and the background thread flushes everything
+        flushes = vote_buffer.flushes
+        login(client, make_user('voter3'))
+        vote(client, post, 'down')
+        deadline = time.time() + 5
+        while vote_buffer.flushes == flushes and time.time() < deadline:
+            time.sleep(0.01)
+        assert vote_buffer.flushes == flushes + 1
+        db.session.expire_all()
+        post = db.session.get(Post, post_id)
+        assert (post.upvotes, post.downvotes, post.vote_score) == (1, 2, -1)
+        assert post.hot_score == hot_score(-1, post.created_at)
+
+        vote(client, post, 'down')  # toggled off, waits for the shutdown flush
+        vote_buffer.shutdown()
+        db.session.expire_all()
+        assert db.session.get(Post, post_id).vote_score == 0
+        assert repair_vote_counts() == {}
+    finally:
+        vote_buffer.shutdown()
+        app.config['VOTE_BUFFER_ENABLED'] = False
+        vote_buffer.init_app(app)
+
+
+def test_buffered_vote_changes_the_etag(app, client):
+    from backend.vote_buffer import vote_buffer
+    app.config['VOTE_BUFFER_ENABLED'] = True
+    app.config['VOTE_BUFFER_FLUSH_MS'] = 60000
+    vote_buffer.init_app(app)
+    try:
+        post = make_post(make_user('author'))
+        login(client, make_user('voter'))
+        urls = ['/api/posts', f'/api/posts/{post.id}']
+        etags = {url: client.get(url).headers['ETag'] for url in urls}
+        flushes = vote_buffer.flushes
+
+        vote(client, post, 'up')
+        # the post row (and its revision) waits for the flush, the voter's page can't
+        feed = client.get('/api/posts', headers={'If-None-Match': etags['/api/posts']})
+        assert feed.status_code == 200
+        assert feed.get_json()['posts'][0]['user_vote'] == 'up'
+        detail = client.get(urls[1], headers={'If-None-Match': etags[urls[1]]})
+        assert detail.status_code == 200
+        assert detail.get_json()['post']['user_vote'] == 'up'
+        assert vote_buffer.flushes == flushes
+    finally:
+        vote_buffer.shutdown()
+        app.config['VOTE_BUFFER_ENABLED'] = False
+        vote_buffer.init_app(app)
+
+
+def test_my_votes_batch(app, client, count_queries):
+    author = make_user('author')
+    posts = [make_post(author, title=f'Internship number {i}') for i in range(3)]
+    login(client, make_user('voter'))
+    vote(client, posts[0], 'up')
+    vote(client, posts[2], 'down')
+
+    ids = [post.id for post in posts] + [9999]
+    count_queries.clear()
+    data = client.get('/api/votes/mine?post_ids=' + ','.join(str(i) for i in ids)).get_json()
+    assert data['votes'] == {str(posts[0].id): 'up', str(posts[1].id): None, str(posts[2].id): 'down', '9999': None}
+    assert len(count_queries) == 1
+
+    assert client.post('/api/votes/mine', json={'post_ids': ids}).get_json() == data
+    assert client.get('/api/votes/mine?post_ids=1,abc').status_code == 400
+    assert client.post('/api/votes/mine', json={'post_ids': list(range(501))}).status_code == 400
+
+    with client.session_transaction() as sess:
+        sess.clear()
+    assert client.get('/api/votes/mine?post_ids=1').status_code == 401
+
+
+def test_concurrent_conflicting_votes(tmp_path):
+    # real threads need a real file - the in-memory db is one shared connection
+    from threading import Thread, Barrier
+    from conftest import make_app
+
+    file_app = make_app(f'sqlite:///{tmp_path / "votes.db"}',
+                        SQLALCHEMY_ENGINE_OPTIONS={'connect_args': {'timeout': 30}})
+    with file_app.app_context():
+        db.create_all()
+        author = make_user('author')
+        post_id = make_post(author).id
+        user_ids = [make_user(f'voter{i}').id for i in range(6)]
+        db.session.remove()
+
+    clicks = 20
+    statuses = []
+    barrier = Barrier(len(user_ids) * 2)
+
+    def clicker(user_id, vote_type):
+        # two threads per user hammering up and down on the same post at once
+        client = file_app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        barrier.wait()
+        for _ in range(clicks):
+            response = client.post('/api/votes', json={'post_id': post_id, 'vote_type': vote_type})
+            statuses.append(response.status_code)
+
+    threads = [Thread(target=clicker, args=(user_id, vote_type))
+               for user_id in user_ids for vote_type in ('up', 'down')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with file_app.app_context():
+        assert statuses == [200] * len(threads) * clicks
+        post = db.session.get(Post, post_id)
+        up = db.session.query(Vote).filter_by(post_id=post_id, vote_type='up').count()
+        down = db.session.query(Vote).filter_by(post_id=post_id, vote_type='down').count()
+        assert (post.upvotes, post.downvotes, post.vote_score) == (up, down, up - down)
+        assert db.session.query(Vote).count() <= len(user_ids)
+        db.session.remove()
+        db.drop_all()